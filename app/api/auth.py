@@ -1,41 +1,71 @@
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.models.user import User
 from app.schemas.auth import RegisterIn, LoginIn, TokenOut
 from app.schemas.user import UserOut
-from app.core.security import hash_password, verify_password, create_access_token
-from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.security import (
+    PasswordHasherBusy,
+    hash_password_async,
+    verify_password_async,
+    create_access_token,
+)
+from app.api.deps import Principal, get_token_payload, get_verified_principal
+from app.services.token_denylist import revoke_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+_BUSY = HTTPException(status_code=503, detail="Too many login attempts in progress, retry shortly", headers={"Retry-After": "1"})
+
 @router.post("/register", response_model=UserOut)
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == payload.email).first()
+async def register(payload: RegisterIn, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User).where(User.email == payload.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
+
+    try:
+        password_hash = await hash_password_async(payload.password)
+    except PasswordHasherBusy:
+        raise _BUSY
+
     user = User(
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginIn, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == payload.email))
+    try:
+        ok = bool(user) and await verify_password_async(payload.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise _BUSY
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    token = create_access_token(subject=str(user.id))
+
+    claims = {"email": user.email} if settings.jwt_embed_claims else None
+    token = create_access_token(subject=str(user.id), claims=claims)
     return TokenOut(access_token=token)
 
+@router.post("/logout")
+def logout(payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)):
+    jti = payload.get("jti")
+    if not jti:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked (missing jti)")
+    revoke_token(db, jti, datetime.fromtimestamp(payload["exp"], tz=timezone.utc))
+    return {"ok": True}
+
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+def me(current_user: Principal = Depends(get_verified_principal)):
+    return current_user
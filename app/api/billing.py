@@ -1,35 +1,29 @@
 from uuid import uuid4
 import calendar
+import hashlib
 from datetime import datetime, timezone, timedelta
-from app.utils.dt import as_utc_aware
+from app.utils.dt import as_utc_aware, parse_iso_datetime
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_db
-from app.api.deps import get_current_user
-from app.models.plan import Plan
+from app.db.session import get_db, get_async_db
+from app.db.queries import get_user_entitlement
+from app.api.deps import Principal, get_current_principal
 from app.models.entitlement import Entitlement
-from app.integrations.mercadopago_client import mp_sdk
+from app.integrations.mp_preferences import mp_create_preference
 from app.integrations.mp_subscriptions import mp_create_preapproval, mp_update_preapproval, mp_get_preapproval
+from app.services.entitlement_cache import invalidate_user_entitlements
+from app.services.plan_catalog import PlanCatalog, get_plan_catalog
 from app.schemas.billing import PlanOut, CreateOneTimeLinkIn, CreateOneTimeLinkOut, CreateRecurringLinkIn, CreateRecurringLinkOut, CancelRecurringIn, CancelRecurringOut
-from app.models.user import User
 
 router = APIRouter(prefix="/billing", tags=["billing"])
 
 
-def _parse_iso_datetime(value: str | None) -> datetime | None:
-    if not value:
-        return None
-    try:
-        if value.endswith("Z"):
-            value = value[:-1] + "+00:00"
-        return datetime.fromisoformat(value)
-    except Exception:
-        return None
-
-
 def _add_interval(start: datetime, count: int, unit: str) -> datetime:
     if unit == "days":
         return start + timedelta(days=count)
@@ -45,19 +39,51 @@ def _add_interval(start: datetime, count: int, unit: str) -> datetime:
         return start.replace(year=year, day=day)
     return start
 
+# Pre-encoded /billing/plans body, rebuilt only when the catalog snapshot changes
+_plans_response: tuple[PlanCatalog, bytes, str] | None = None
+_plans_adapter = TypeAdapter(list[PlanOut])
+
+
+def _plans_body_and_etag() -> tuple[bytes, str]:
+    global _plans_response
+    catalog = get_plan_catalog()
+    cached = _plans_response
+    if cached is None or cached[0] is not catalog:
+        body = _plans_adapter.dump_json([PlanOut.model_validate(p) for p in catalog.plans])
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        cached = _plans_response = (catalog, body, etag)
+    return cached[1], cached[2]
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as If-None-Match requires
+    candidates = (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    return etag in candidates
+
 # Display available subscription plans
 @router.get("/plans", response_model=list[PlanOut])
-def list_plans(db: Session = Depends(get_db)):
-    return db.query(Plan).order_by(Plan.kind, Plan.price).all()
+def list_plans(request: Request):
+    body, etag = _plans_body_and_etag()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.plans_cache_max_age_s}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 # Create a one-time payment link
 @router.post("/one-time/link", response_model=CreateOneTimeLinkOut)
-def create_one_time_payment_link(
+async def create_one_time_payment_link(
     payload: CreateOneTimeLinkIn,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    plan = db.query(Plan).filter(Plan.code == payload.plan_code).first()
+    plan = get_plan_catalog().by_code.get(payload.plan_code)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     if plan.kind != "one_time":
@@ -67,15 +93,12 @@ def create_one_time_payment_link(
     order_id = str(uuid4())
 
     #Create or reuse entitlement row for this user+plan
-    ent = db.query(Entitlement).filter(
-        Entitlement.user_id == user.id,
-        Entitlement.plan_id == plan.id
-    ).first()
+    ent = await get_user_entitlement(db, user.id, plan.id)
 
     if not ent:
         ent = Entitlement(user_id=user.id, plan_id=plan.id, status="inactive")
         db.add(ent)
-        db.flush() #assigns ent.id without committing
+        await db.flush() #assigns ent.id without committing
 
     # Preference payload (checkout PRO)
     preference_data = {
@@ -106,12 +129,8 @@ def create_one_time_payment_link(
         "auto_return": "approved",
     }
 
-    sdk = mp_sdk()
-
     #create preference item
-    result = sdk.preference().create(preference_data)
-    resp = result.get("response") or {}
-    status = result.get("status")
+    status, resp = await mp_create_preference(preference_data)
 
     if status not in (200, 201):
         raise HTTPException(502, {"mp_status": status, "mp_response": resp})
@@ -127,7 +146,7 @@ def create_one_time_payment_link(
     
     #Store MP reference (still inactive until webhook confirms payment)
     ent.mp_preference_id = preference_id
-    db.commit()
+    await db.commit()
 
     return CreateOneTimeLinkOut(preference_id=preference_id, init_point=init_point)
 
@@ -135,11 +154,11 @@ def create_one_time_payment_link(
 @router.post("/recurring/link", response_model=CreateRecurringLinkOut)
 async def create_recurring_subscription_link(
     payload: CreateOneTimeLinkIn,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal)
 ):
     # Validate Plan
-    plan = db.query(Plan).filter(Plan.code == payload.plan_code).first()
+    plan = get_plan_catalog().by_code.get(payload.plan_code)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     
@@ -150,15 +169,12 @@ async def create_recurring_subscription_link(
         raise HTTPException(status_code=500, detail="Recurring plan is missing interval information")
     
     #2) Create or reuse entitlement
-    ent = db.query(Entitlement).filter(
-        Entitlement.user_id == user.id,
-        Entitlement.plan_id == plan.id,
-    ).first()
+    ent = await get_user_entitlement(db, user.id, plan.id)
 
     if not ent:
         ent = Entitlement(user_id=user.id, plan_id=plan.id, status="inactive")
         db.add(ent)
-        db.flush()  # assigns ent.id without committing
+        await db.flush()  # assigns ent.id without committing
     
     #3) Stable identifiers to map webhook -> entitlement
     order_id = str(uuid4())
@@ -202,36 +218,47 @@ async def create_recurring_subscription_link(
     
     #6) Store MP reference (still inactive until webhook confirms)
     ent.mp_preapproval_id = str(preapproval_id)
-    db.commit()
+    await db.commit()
 
     return CreateRecurringLinkOut(preapproval_id=str(preapproval_id), init_point=init_point)
 
 # Obtain current user's billing info and entitlements
+# Read-only projection for /billing/me: plain rows, no ORM identity-map
+# bookkeeping; plan fields come from the catalog. Built once, bound per request.
+_MY_ENTITLEMENTS = select(
+    Entitlement.plan_id,
+    Entitlement.status,
+    Entitlement.expires_at,
+    Entitlement.mp_payment_id,
+    Entitlement.mp_preference_id,
+    Entitlement.mp_preapproval_id,
+).where(Entitlement.user_id == bindparam("user_id"))
+
 @router.get("/me")
-def my_billing(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    ents = (db.query(Entitlement, Plan)
-            .join(Plan, Plan.id == Entitlement.plan_id)
-            .filter(Entitlement.user_id == user.id)
-            .all()
-            )
-    
+def my_billing(db: Session = Depends(get_db), user: Principal = Depends(get_current_principal)):
+    rows = db.execute(_MY_ENTITLEMENTS, {"user_id": user.id}).all()
+    plans = get_plan_catalog().by_id
+
     now = datetime.now(timezone.utc)
 
     out = []
-    for ent, plan in ents:
-        exp = as_utc_aware(ent.expires_at)
+    for plan_id, status, expires_at, mp_payment_id, mp_preference_id, mp_preapproval_id in rows:
+        plan = plans.get(plan_id)
+        if plan is None:
+            continue
+        exp = as_utc_aware(expires_at)
         is_active = (
-            (ent.status == "active" and (exp is None or exp > now))
-            or (ent.status == "canceled" and exp and exp > now)
+            (status == "active" and (exp is None or exp > now))
+            or (status == "canceled" and exp and exp > now)
         )
         out.append({
             "plan_code": plan.code,
             "plan_kind": plan.kind,
-            "status": ent.status,
+            "status": status,
             "expires_at": exp.isoformat() if exp else None,
-            "mp_payment_id": ent.mp_payment_id,
-            "mp_preference_id": ent.mp_preference_id,
-            "mp_preapproval_id": ent.mp_preapproval_id,
+            "mp_payment_id": mp_payment_id,
+            "mp_preference_id": mp_preference_id,
+            "mp_preapproval_id": mp_preapproval_id,
             "is_active_now": is_active,
         })
 
@@ -240,19 +267,16 @@ def my_billing(db: Session = Depends(get_db), user: User = Depends(get_current_u
 @router.post("/recurring/cancel", response_model=CancelRecurringOut)
 async def cancel_recurring_subscription(
     payload: CancelRecurringIn,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
 ):
-    plan = db.query(Plan).filter(Plan.code == payload.plan_code).first()
+    plan = get_plan_catalog().by_code.get(payload.plan_code)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
     if plan.kind != "recurring":
         raise HTTPException(status_code=400, detail="Plan is not a recurring subscription plan")
 
-    ent = db.query(Entitlement).filter(
-        Entitlement.user_id == user.id,
-        Entitlement.plan_id == plan.id,
-    ).first()
+    ent = await get_user_entitlement(db, user.id, plan.id)
     if not ent:
         raise HTTPException(status_code=404, detail="Entitlement not found")
     if not ent.mp_preapproval_id:
@@ -264,11 +288,11 @@ async def cancel_recurring_subscription(
 
     auto = mp_get_resp.get("auto_recurring") or {}
     end_date_str = auto.get("end_date") or mp_get_resp.get("next_payment_date")
-    cancel_at = _parse_iso_datetime(end_date_str)
+    cancel_at = parse_iso_datetime(end_date_str)
 
     if not cancel_at:
         base_str = mp_get_resp.get("last_charge_date") or mp_get_resp.get("date_created") or auto.get("start_date")
-        base_dt = _parse_iso_datetime(base_str) or datetime.now(timezone.utc)
+        base_dt = parse_iso_datetime(base_str) or datetime.now(timezone.utc)
         cancel_at = _add_interval(base_dt, int(plan.interval_count), str(plan.interval_unit))
 
     update_payload = {"auto_recurring": {"end_date": cancel_at.isoformat()}} if cancel_at else {"status": "cancelled"}
@@ -279,7 +303,8 @@ async def cancel_recurring_subscription(
 
     ent.status = "canceled"
     ent.expires_at = as_utc_aware(cancel_at) if cancel_at else ent.expires_at
-    db.commit()
+    await db.commit()
+    invalidate_user_entitlements(ent.user_id)
 
     return CancelRecurringOut(
         preapproval_id=ent.mp_preapproval_id,
@@ -1,28 +1,156 @@
+import hmac
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.security import decode_token
 from app.db.session import get_db
 from app.models.user import User
+from app.services.token_denylist import is_token_revoked
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
-def get_current_user(
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Lightweight identity: built from the token claims (no DB hit), or from
+    a plain users row - never a session-tracked User.
+    """
+    id: int
+    email: str
+
+
+# Built once; per request SQLAlchemy only binds the id
+_USER_BY_ID = select(User.id, User.email).where(User.id == bindparam("user_id"))
+
+
+class _UserCache:
+    """
+    Bounded LRU of users loaded from the DB, keyed by id: Principals
+    (tokens without claims, /auth/me) or detached User rows (get_current_user).
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[int, Principal | User] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Principal | User | None:
+        with self._lock:
+            user = self._data.get(user_id)
+            if user is not None:
+                self._data.move_to_end(user_id)
+            return user
+
+    def set(self, user: Principal | User) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[user.id] = user
+            self._data.move_to_end(user.id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+
+user_cache = _UserCache(settings.user_cache_max_entries)
+user_row_cache = _UserCache(settings.user_cache_max_entries)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Call after committing a change to a users row."""
+    user_cache.invalidate(user_id)
+    user_row_cache.invalidate(user_id)
+
+
+def get_token_payload(
         creds: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-        db: Session = Depends(get_db)
-) -> User:
+        db: Session = Depends(get_db),
+) -> dict:
+    if creds is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
     token = creds.credentials
     try:
         payload = decode_token(token)
         sub = payload.get("sub")
         if not sub:
             raise HTTPException(status_code=401, detail="Invalid token (missing sub)")
-        user_id = int(sub)
+        int(sub)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or Expried token")
-    
-    user = db.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+
+    if is_token_revoked(db, payload.get("jti")):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
+
+
+def _load_user(db: Session, user_id: int) -> Principal:
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.execute(_USER_BY_ID, {"user_id": user_id}).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = Principal(id=row.id, email=row.email)
+        user_cache.set(user)
+    return user
+
+
+def get_verified_principal(
+        payload: dict = Depends(get_token_payload),
+        db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Principal whose user still exists (checked against the DB through the
+    user cache), unlike get_current_principal. Not a User row: use
+    get_current_user when the route needs ORM attributes.
+    """
+    return _load_user(db, int(payload["sub"]))
+
+
+def get_current_user(
+        payload: dict = Depends(get_token_payload),
+        db: Session = Depends(get_db)
+) -> User:
+    """
+    The full User row, from a bounded LRU of detached rows (shared between
+    requests: read only, no lazy loads; db.merge() it to change it and call
+    invalidate_user after the commit).
+    """
+    user_id = int(payload["sub"])
+    user = user_row_cache.get(user_id)
+    if user is None:
+        user = db.get(User, user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        db.expunge(user)
+        user_row_cache.set(user)
+    return user
+
+
+def get_current_principal(
+        payload: dict = Depends(get_token_payload),
+        db: Session = Depends(get_db)
+) -> Principal:
+    user_id = int(payload["sub"])
+    email = payload.get("email")
+    if email:
+        return Principal(id=user_id, email=email)
+    # tokens issued without claims: fall back to the (cached) user
+    return _load_user(db, user_id)
+
+
+def require_service_token(creds: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> None:
+    """Internal service-to-service routes: bearer token from INTERNAL_API_TOKENS."""
+    token = creds.credentials.encode() if creds else b""
+    if not token or not any(hmac.compare_digest(token, t.encode()) for t in settings.internal_api_tokens):
+        raise HTTPException(status_code=401, detail="Invalid service token")
@@ -1,36 +1,71 @@
 from datetime import datetime, timezone
 from fastapi import Depends, HTTPException
+from sqlalchemy import bindparam, exists, select
 from sqlalchemy.orm import Session
 
+from app.db.queries import entitlement_active_clause, entitlement_lapsed_clause
 from app.db.session import get_db
-from app.api.deps import get_current_user
+from app.api.deps import Principal, get_current_principal
 from app.models.entitlement import Entitlement
-from app.models.plan import Plan
-from app.models.user import User
+from app.services.plan_catalog import get_plan_catalog
+from app.services.entitlement_cache import CachedEntitlement, entitlement_cache, to_cached_entitlement
+
+
+# Built once: per call SQLAlchemy only binds parameters (no expression
+# building / cache-key work on the hot path).
+_ACTIVE_ENTITLEMENTS = (
+    select(Entitlement.id, Entitlement.plan_id, Entitlement.status, Entitlement.expires_at)
+    .where(Entitlement.user_id == bindparam("user_id"), entitlement_active_clause(bindparam("now")))
+)
+_HAS_LAPSED = select(exists().where(
+    Entitlement.user_id == bindparam("user_id"),
+    entitlement_lapsed_clause(bindparam("now")),
+))
+_HAS_LAPSED_FOR_PLANS = select(exists().where(
+    Entitlement.user_id == bindparam("user_id"),
+    entitlement_lapsed_clause(bindparam("now")),
+    Entitlement.plan_id.in_(bindparam("plan_ids", expanding=True)),
+))
+
+
+def _load_gating_entitlements(db: Session, user_id: int, now: datetime) -> tuple[CachedEntitlement, ...]:
+    # only rows granting access right now (time check in SQL), answered from
+    # ix_entitlements_user_status_expires_plan alone
+    rows = db.execute(_ACTIVE_ENTITLEMENTS, {"user_id": user_id, "now": now}).all()
+    # plan codes come from the in-memory catalog (no join on plans)
+    plans = get_plan_catalog().by_id
+    return tuple(
+        to_cached_entitlement(ent_id, plans[plan_id].code if plan_id in plans else "", status, expires_at)
+        for ent_id, plan_id, status, expires_at in rows
+    )
+
+
+def _has_lapsed_entitlement(db: Session, user_id: int, plan_codes: list[str] | None, now: datetime) -> bool:
+    """Denied requests only: picks the 402 message."""
+    if not plan_codes:
+        return bool(db.scalar(_HAS_LAPSED, {"user_id": user_id, "now": now}))
+    plans = get_plan_catalog().by_code
+    plan_ids = [plans[c].id for c in plan_codes if c in plans]
+    return bool(db.scalar(_HAS_LAPSED_FOR_PLANS, {"user_id": user_id, "now": now, "plan_ids": plan_ids}))
 
-from app.utils.dt import as_utc_aware
 
 def require_active_entitlement(plan_codes: list[str] | None = None):
-    def _dep(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-        q = db.query(Entitlement).join(Plan, Plan.id == Entitlement.plan_id).filter(
-            Entitlement.user_id == user.id,
-            Entitlement.status.in_(("active", "canceled")),
-        )
-        if plan_codes:
-            q = q.filter(Plan.code.in_(plan_codes))
-
-        ent = q.first()
-        if not ent:
-            raise HTTPException(status_code=402, detail="Active entitlement required")
-        
+    def _dep(db: Session = Depends(get_db), user: Principal = Depends(get_current_principal)):
         now = datetime.now(timezone.utc)
-        exp = as_utc_aware(ent.expires_at) if ent.expires_at else None
 
-        if ent.status == "canceled" and not exp:
-            raise HTTPException(status_code=402, detail="Entitlement has expired")
+        # DB only on a cache miss (see app/services/entitlement_cache.py)
+        ents = entitlement_cache.get(user.id, now)
+        if ents is None:
+            # taken before the read: a commit + invalidation in between drops the write
+            generation = entitlement_cache.generation
+            ents = _load_gating_entitlements(db, user.id, now)
+            entitlement_cache.set(user.id, ents, now, generation)
+
+        for ent in ents:
+            if ent.is_active(now) and (not plan_codes or ent.plan_code in plan_codes):
+                return ent
 
-        if exp and exp < now:
+        if _has_lapsed_entitlement(db, user.id, plan_codes, now):
             raise HTTPException(status_code=402, detail="Entitlement has expired")
-        
-        return ent
+        raise HTTPException(status_code=402, detail="Active entitlement required")
     return _dep
@@ -0,0 +1,101 @@
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import require_service_token
+from app.core.config import settings
+from app.db.queries import entitlement_active_clause
+from app.db.session import AsyncSessionLocal, get_async_db
+from app.models.entitlement import Entitlement
+from app.schemas.internal import EntitlementCheckIn, EntitlementCheckOut
+from app.services.plan_catalog import get_plan_catalog
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_service_token)])
+
+# ids per query when streaming (bounded memory and bind-parameter count)
+_STREAM_CHUNK = 1000
+
+# Same rules as require_active_entitlement, for many users in one query
+# (answered from ix_entitlements_user_status_expires_plan)
+_ACTIVE_FOR_USERS = (
+    select(Entitlement.user_id, Entitlement.plan_id)
+    .where(
+        Entitlement.user_id.in_(bindparam("user_ids", expanding=True)),
+        entitlement_active_clause(bindparam("now")),
+    )
+)
+_ACTIVE_FOR_USERS_AND_PLANS = _ACTIVE_FOR_USERS.where(
+    Entitlement.plan_id.in_(bindparam("plan_ids", expanding=True)),
+)
+
+
+def _plan_ids(plan_codes: list[str] | None) -> list[int] | None:
+    if not plan_codes:
+        return None
+    plans = get_plan_catalog().by_code
+    return [plans[c].id for c in plan_codes if c in plans]
+
+
+async def _active_plans(
+    db: AsyncSession,
+    user_ids: list[int],
+    plan_ids: list[int] | None,
+    now: datetime,
+) -> dict[int, list[str]]:
+    result: dict[int, list[str]] = {uid: [] for uid in user_ids}
+    if plan_ids == []:
+        # only unknown plan codes requested: nobody can hold them
+        return result
+    if plan_ids is None:
+        rows = await db.execute(_ACTIVE_FOR_USERS, {"user_ids": user_ids, "now": now})
+    else:
+        rows = await db.execute(_ACTIVE_FOR_USERS_AND_PLANS, {"user_ids": user_ids, "now": now, "plan_ids": plan_ids})
+    plans = get_plan_catalog().by_id
+    for user_id, plan_id in rows:
+        plan = plans.get(plan_id)
+        if plan is not None:
+            result[user_id].append(plan.code)
+    return result
+
+
+def _unique_ids(payload: EntitlementCheckIn, limit: int) -> list[int]:
+    user_ids = list(dict.fromkeys(payload.user_ids))
+    if len(user_ids) > limit:
+        raise HTTPException(status_code=422, detail=f"At most {limit} user ids per request")
+    return user_ids
+
+
+@router.post("/entitlements/check", response_model=EntitlementCheckOut)
+async def check_entitlements(payload: EntitlementCheckIn, db: AsyncSession = Depends(get_async_db)):
+    """Premium access for a list of users (no user tokens needed)."""
+    user_ids = _unique_ids(payload, settings.internal_check_max_users)
+    users = await _active_plans(db, user_ids, _plan_ids(payload.plan_codes), datetime.now(timezone.utc))
+    return EntitlementCheckOut(users=users)
+
+
+@router.post("/entitlements/check/stream")
+async def check_entitlements_stream(payload: EntitlementCheckIn):
+    """
+    Large batches: NDJSON, one {"user_id", "plans"} line per user, queried
+    and sent in chunks so neither side holds the whole answer.
+    """
+    user_ids = _unique_ids(payload, settings.internal_check_stream_max_users)
+    plan_ids = _plan_ids(payload.plan_codes)
+    now = datetime.now(timezone.utc)
+
+    async def lines() -> AsyncIterator[bytes]:
+        # own session: the response body outlives the request's dependencies
+        async with AsyncSessionLocal() as db:
+            for start in range(0, len(user_ids), _STREAM_CHUNK):
+                chunk = await _active_plans(db, user_ids[start:start + _STREAM_CHUNK], plan_ids, now)
+                yield "".join(
+                    json.dumps({"user_id": uid, "plans": plans}, separators=(",", ":")) + "\n"
+                    for uid, plans in chunk.items()
+                ).encode()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
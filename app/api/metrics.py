@@ -0,0 +1,35 @@
+import anyio.to_thread
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import require_service_token
+from app.core.metrics import Gauge, render_metrics
+from app.integrations.mp_cache import mp_resource_cache
+from app.integrations.mp_http import mp_inflight
+from app.services.entitlement_cache import entitlement_cache
+from app.services.webhook_dedupe import dedupe_stats
+
+# internal data: scraped with a service token, like /internal
+router = APIRouter(tags=["metrics"], dependencies=[Depends(require_service_token)])
+
+
+def _threadpool():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return [(("borrowed",), limiter.borrowed_tokens), (("total",), limiter.total_tokens)]
+
+
+Gauge("threadpool_tokens", "AnyIO default threadpool tokens (sync endpoints/dependencies)", ("state",), _threadpool)
+Gauge("mp_cache", "MP resource cache counters", ("stat",),
+      lambda: [((k,), v) for k, v in mp_resource_cache.stats().items()])
+Gauge("mp_singleflight", "Coalesced MP GETs (shared = callers served by another in-flight call)", ("stat",),
+      lambda: [((k,), v) for k, v in mp_inflight.stats().items()])
+Gauge("entitlement_cache", "Premium gating cache counters", ("stat",),
+      lambda: [((k,), v) for k, v in entitlement_cache.stats().items()])
+Gauge("webhook_dedupe", "Webhook notifications checked/absorbed by the dedupe ledger", ("stat",),
+      lambda: [((k,), v) for k, v in dedupe_stats.items()])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # async on purpose: the threadpool gauge must be read from the event loop
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
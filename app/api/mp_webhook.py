@@ -1,51 +1,74 @@
-import asyncio
-from datetime import datetime, timedelta, timezone
+import logging
+from datetime import datetime
 from typing import Any
 
-import httpx
 from fastapi import APIRouter, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_async_db
+from app.integrations.mp_cache import (
+    cache_mp_resource,
+    get_cached_mp_resource,
+    invalidate_mp_resource,
+    mp_cache_generation,
+)
+from app.integrations.mp_http import mp_get
 from app.integrations.mp_webhooks import verify_mp_signature
 from app.models.entitlement import Entitlement
-from app.models.plan import Plan
+from app.services.entitlement_cache import invalidate_user_entitlements
+from app.services.entitlement_state import apply_payment_state, apply_preapproval_state
+from app.services.webhook_dedupe import is_duplicate_notification
+from app.services.webhook_inbox import DeferProcessing, enqueue_webhook_event
+from app.utils.dt import parse_iso_datetime
 
 router = APIRouter(prefix="/mp", tags=["mercado_pago"])
 
-MP_API_BASE = "https://api.mercadopago.com"
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------
 # MP HTTP helpers
 # ---------------------------
 
-async def mp_get_json(path: str) -> dict[str, Any]:
-    url = f"{MP_API_BASE}{path}"
-    headers = {"Authorization": f"Bearer {settings.mp_access_token}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(url, headers=headers)
-        if r.status_code != 200:
-            # keep body as text to avoid json decode surprises
-            raise HTTPException(502, {"mp_status": r.status_code, "mp_response": r.text, "url": url})
-        return r.json()
+async def mp_get_json(path: str, key: tuple[str, str]) -> dict[str, Any]:
+    # key = (kind, resource_id): concurrent fetches of the same resource share one call
+    r = await mp_get(path, key)
+    if r.status_code != 200:
+        # keep body as text to avoid json decode surprises
+        raise HTTPException(502, {"mp_status": r.status_code, "mp_response": r.text, "url": str(r.request.url)})
+    return r.json()
+
+
+async def _get_cached_json(kind: str, resource_id: str, path: str) -> dict[str, Any]:
+    # read-through app/integrations/mp_cache.py
+    cached = get_cached_mp_resource(kind, resource_id)
+    if cached is not None:
+        return cached
+    generation = mp_cache_generation()
+    data = await mp_get_json(path, (kind, str(resource_id)))
+    cache_mp_resource(kind, resource_id, data, generation)
+    return data
 
 
 async def fetch_payment(payment_id: str) -> dict[str, Any]:
-    return await mp_get_json(f"/v1/payments/{payment_id}")
+    return await _get_cached_json("payment", payment_id, f"/v1/payments/{payment_id}")
 
 
 async def fetch_merchant_order(merchant_order_id: str) -> dict[str, Any]:
-    return await mp_get_json(f"/merchant_orders/{merchant_order_id}")
+    return await _get_cached_json("merchant_order", merchant_order_id, f"/merchant_orders/{merchant_order_id}")
 
 
 async def fetch_preapproval(preapproval_id: str) -> dict[str, Any]:
-    return await mp_get_json(f"/preapproval/{preapproval_id}")
+    return await _get_cached_json("preapproval", preapproval_id, f"/preapproval/{preapproval_id}")
 
 
 async def fetch_authorized_payment(authorized_payment_id: str) -> dict[str, Any]:
-    return await mp_get_json(f"/authorized_payments/{authorized_payment_id}")
+    return await mp_get_json(
+        f"/authorized_payments/{authorized_payment_id}",
+        ("authorized_payment", str(authorized_payment_id)),
+    )
 
 
 # ---------------------------
@@ -91,6 +114,37 @@ def _extract_entitlement_id_from_preapproval(pre: dict[str, Any]) -> int | None:
     return _parse_entitlement_id_from_external_reference(external_reference)
 
 
+# Fallback mapping when MP payloads carry neither metadata.entitlement_id nor a
+# parseable external_reference: the ids we stored at checkout/subscription
+# time, each one indexed lookup (no extra MP fetch to recover the reference).
+_ENTITLEMENT_BY_MP_ID = {
+    column.key: select(Entitlement).where(column == bindparam("mp_id")).limit(1)
+    for column in (Entitlement.mp_preapproval_id, Entitlement.mp_payment_id, Entitlement.mp_preference_id)
+}
+
+
+async def _find_entitlement_by_mp_ids(
+    db: AsyncSession,
+    *,
+    preapproval_id: str | None = None,
+    payment_id: str | None = None,
+    preference_id: str | None = None,
+) -> Entitlement | None:
+    # most specific first: a preapproval id is unique, preferences can be reused
+    for key, mp_id in (
+        ("mp_preapproval_id", preapproval_id),
+        ("mp_payment_id", payment_id),
+        ("mp_preference_id", preference_id),
+    ):
+        if not mp_id:
+            continue
+        ent = (await db.execute(_ENTITLEMENT_BY_MP_ID[key], {"mp_id": str(mp_id)})).scalar_one_or_none()
+        if ent is not None:
+            logger.info("Entitlement mapped by MP id", extra={"entitlement_id": ent.id, "column": key, "mp_id": str(mp_id)})
+            return ent
+    return None
+
+
 def _pick_latest_payment_id_from_merchant_order(mo: dict[str, Any]) -> str | None:
     payments = mo.get("payments") or []
     # payments usually list objects with id/status
@@ -101,30 +155,6 @@ def _pick_latest_payment_id_from_merchant_order(mo: dict[str, Any]) -> str | Non
     return None
 
 
-async def _resolve_payment_id_from_merchant_order(
-    merchant_order_id: str,
-    attempts: int = 10,
-    base_delay_seconds: float = 1.2,
-) -> tuple[str | None, dict[str, Any]]:
-    """
-    MP may send merchant_order before payments[] is populated.
-    We do short polling.
-    """
-    last_mo: dict[str, Any] = {}
-    for i in range(attempts):
-        mo = await fetch_merchant_order(merchant_order_id)
-        last_mo = mo
-
-        pid = _pick_latest_payment_id_from_merchant_order(mo)
-        if pid:
-            return pid, mo
-
-        # exponential-ish backoff
-        await asyncio.sleep(base_delay_seconds * (1.0 + i * 0.35))
-
-    return None, last_mo
-
-
 def _maybe_verify_signature(request: Request, data_id: str) -> None:
     """
     Verify MP signature only if:
@@ -139,7 +169,7 @@ def _maybe_verify_signature(request: Request, data_id: str) -> None:
     x_request_id = request.headers.get("x-request-id", "")
 
     if not x_signature or not x_request_id:
-        print("MP signature headers missing; skipping verification for this request.")
+        logger.info("MP signature headers missing; skipping verification", extra={"mp_data_id": str(data_id)})
         return
 
     ok = verify_mp_signature(
@@ -168,110 +198,74 @@ def _extract_id_from_resource_url(resource: str, needle: str) -> str | None:
         return None
 
 
-def _parse_iso_datetime(value: str | None) -> datetime | None:
-    if not value:
-        return None
-    try:
-        if value.endswith("Z"):
-            value = value[:-1] + "+00:00"
-        return datetime.fromisoformat(value)
-    except Exception:
-        return None
-
-
 # ---------------------------
 # core processors
 # ---------------------------
 
-async def _process_payment(payment_id: str, payment: dict[str, Any], db: Session) -> dict[str, Any]:
+async def _process_payment(
+    payment_id: str,
+    payment: dict[str, Any],
+    db: AsyncSession,
+    preference_id: str | None = None,
+) -> dict[str, Any]:
     status = payment.get("status")  # approved / pending / rejected
     status_detail = payment.get("status_detail")
 
-    print("MP payment_id:", payment_id)
-    print("MP status:", status)
-    print("MP status_detail:", status_detail)
-    print("MP payment_method_id:", payment.get("payment_method_id"))
-    print("MP payment_type_id:", payment.get("payment_type_id"))
-
     ent_id = _extract_entitlement_id_from_payment(payment)
-    if not ent_id:
-        return {"ok": True, "warning": "Could not map entitlement (payment)"}
-
-    ent = db.get(Entitlement, int(ent_id))
-    if not ent:
-        return {"ok": True, "warning": "Entitlement not found (payment)"}
-
-    # idempotency
-    if ent.mp_payment_id == str(payment_id) and ent.status == "active":
-        return {"ok": True, "idempotent": True}
-
-    ent.mp_payment_id = str(payment_id)
-
-    if status == "approved":
-        plan = db.get(Plan, ent.plan_id)
-        ent.status = "active"
-
-        # one_time -> expiry
-        if plan and plan.kind == "one_time" and plan.access_duration_days:
-            ent.expires_at = datetime.now(timezone.utc) + timedelta(days=int(plan.access_duration_days))
-        else:
-            # recurring via payment doesn't set expires; keep None
-            pass
-
-        db.commit()
-        return {"ok": True, "activated": True}
+    logger.info("MP payment", extra={
+        "mp_payment_id": str(payment_id),
+        "mp_status": status,
+        "mp_status_detail": status_detail,
+        "mp_payment_method_id": payment.get("payment_method_id"),
+        "mp_payment_type_id": payment.get("payment_type_id"),
+        "entitlement_id": ent_id,
+    })
+    if ent_id:
+        ent = await db.get(Entitlement, int(ent_id))
+        if not ent:
+            return {"ok": True, "warning": "Entitlement not found (payment)"}
+    else:
+        ent = await _find_entitlement_by_mp_ids(db, payment_id=payment_id, preference_id=preference_id)
+        if not ent:
+            return {"ok": True, "warning": "Could not map entitlement (payment)"}
 
-    # not approved => no access
-    ent.status = "inactive"
-    db.commit()
-    return {"ok": True, "activated": False, "mp_status": status, "mp_status_detail": status_detail}
+    result = apply_payment_state(ent, payment_id, payment)
+    if result.get("idempotent"):
+        return result
+    await db.commit()
+    invalidate_user_entitlements(ent.user_id)
+    return result
 
 
-async def _process_preapproval(preapproval_id: str, pre: dict[str, Any], db: Session) -> dict[str, Any]:
+async def _process_preapproval(preapproval_id: str, pre: dict[str, Any], db: AsyncSession) -> dict[str, Any]:
     status = pre.get("status")  # authorized / paused / cancelled / pending
     reason = pre.get("reason")
-    print("MP preapproval_id:", preapproval_id)
-    print("MP preapproval status:", status)
-    print("MP preapproval reason:", reason)
-
     ent_id = _extract_entitlement_id_from_preapproval(pre)
-    if not ent_id:
-        return {"ok": True, "warning": "Could not map entitlement (preapproval)"}
-
-    ent = db.get(Entitlement, int(ent_id))
-    if not ent:
-        return {"ok": True, "warning": "Entitlement not found (preapproval)"}
-
-    ent.mp_preapproval_id = str(preapproval_id)
-
-    auto = pre.get("auto_recurring") or {}
-    end_date = auto.get("end_date") or pre.get("next_payment_date")
-    end_dt = _parse_iso_datetime(end_date)
-
-    # Our gating truth: active only when authorized/active
-    if status in ("authorized", "active"):
-        ent.status = "active"
-        # keep local period end in sync if MP provides it
-        if end_dt:
-            ent.expires_at = end_dt
-    elif status in ("cancelled", "canceled"):
-        ent.status = "canceled"
-        ent.expires_at = end_dt or ent.expires_at
-    elif status == "paused":
-        ent.status = "inactive"
-        ent.expires_at = None
+    logger.info("MP preapproval", extra={
+        "mp_preapproval_id": str(preapproval_id),
+        "mp_status": status,
+        "mp_reason": reason,
+        "entitlement_id": ent_id,
+    })
+    if ent_id:
+        ent = await db.get(Entitlement, int(ent_id))
+        if not ent:
+            return {"ok": True, "warning": "Entitlement not found (preapproval)"}
     else:
-        # pending / etc -> keep inactive
-        ent.status = "inactive"
+        ent = await _find_entitlement_by_mp_ids(db, preapproval_id=preapproval_id)
+        if not ent:
+            return {"ok": True, "warning": "Could not map entitlement (preapproval)"}
 
-    db.commit()
-    return {"ok": True, "topic": "preapproval", "mp_status": status, "ent_status": ent.status}
+    result = apply_preapproval_state(ent, preapproval_id, pre)
+    await db.commit()
+    invalidate_user_entitlements(ent.user_id)
+    return result
 
 
 async def _process_authorized_payment(
     authorized_payment_id: str,
     auth: dict[str, Any],
-    db: Session,
+    db: AsyncSession,
 ) -> dict[str, Any]:
     payment = auth.get("payment") or {}
     payment_id = payment.get("id")
@@ -279,12 +273,6 @@ async def _process_authorized_payment(
     payment_status_detail = payment.get("status_detail")
     preapproval_id = auth.get("preapproval_id")
 
-    print("MP authorized_payment_id:", authorized_payment_id)
-    print("MP authorized_payment status:", auth.get("status"))
-    print("MP payment_id:", payment_id)
-    print("MP payment_status:", payment_status)
-    print("MP payment_status_detail:", payment_status_detail)
-
     ent_id: int | None = None
     end_dt: datetime | None = None
     pre: dict[str, Any] | None = None
@@ -292,20 +280,41 @@ async def _process_authorized_payment(
     if external_reference:
         ent_id = _parse_entitlement_id_from_external_reference(external_reference)
 
+    ent: Entitlement | None = None
+    if not ent_id and preapproval_id:
+        ent = await _find_entitlement_by_mp_ids(db, preapproval_id=str(preapproval_id))
+        if ent:
+            ent_id = ent.id
+
     if preapproval_id:
+        # still needed for the period end; MP just advanced next_payment_date
+        # for this charge, so a cached copy would set the previous one
+        invalidate_mp_resource("preapproval", str(preapproval_id))
         pre = await fetch_preapproval(str(preapproval_id))
         if not ent_id:
             ent_id = _extract_entitlement_id_from_preapproval(pre)
         auto = pre.get("auto_recurring") or {}
         end_date = auto.get("end_date") or pre.get("next_payment_date")
-        end_dt = _parse_iso_datetime(end_date)
+        end_dt = parse_iso_datetime(end_date)
+
+    logger.info("MP authorized payment", extra={
+        "mp_authorized_payment_id": str(authorized_payment_id),
+        "mp_status": auth.get("status"),
+        "mp_payment_id": str(payment_id) if payment_id else None,
+        "mp_payment_status": payment_status,
+        "mp_payment_status_detail": payment_status_detail,
+        "mp_preapproval_id": str(preapproval_id) if preapproval_id else None,
+        "entitlement_id": ent_id,
+    })
 
     if not ent_id:
-        return {"ok": True, "warning": "Could not map entitlement (authorized_payment)"}
-
-    ent = db.get(Entitlement, int(ent_id))
-    if not ent:
-        return {"ok": True, "warning": "Entitlement not found (authorized_payment)"}
+        ent = await _find_entitlement_by_mp_ids(db, payment_id=str(payment_id) if payment_id else None)
+        if not ent:
+            return {"ok": True, "warning": "Could not map entitlement (authorized_payment)"}
+    elif ent is None:
+        ent = await db.get(Entitlement, int(ent_id))
+        if not ent:
+            return {"ok": True, "warning": "Entitlement not found (authorized_payment)"}
 
     if preapproval_id:
         ent.mp_preapproval_id = str(preapproval_id)
@@ -321,7 +330,8 @@ async def _process_authorized_payment(
     elif payment_status in ("refunded", "charged_back"):
         ent.status = "inactive"
 
-    db.commit()
+    await db.commit()
+    invalidate_user_entitlements(ent.user_id)
     return {
         "ok": True,
         "topic": "subscription_authorized_payment",
@@ -332,22 +342,16 @@ async def _process_authorized_payment(
 
 
 # ---------------------------
-# webhook endpoint
+# inbox dispatch
 # ---------------------------
 
-@router.post("/webhook")
-async def mp_webhook(request: Request, db: Session = Depends(get_db)):
-    qp = dict(request.query_params)
-    try:
-        body = await request.json()
-    except Exception:
-        body = {}
-
-    print("WEBHOOK HIT", qp)
-    print("WEBHOOK BODY", body)
-
-    topic = request.query_params.get("topic") or body.get("topic")
-    mp_type = body.get("type") or request.query_params.get("type")
+def _classify_notification(qp: dict[str, Any], body: dict[str, Any]) -> tuple[str | None, str | None]:
+    """
+    Maps a raw MP notification (topic= / type= styles, IPN or webhook)
+    to (kind, resource_id). kind is None when we don't handle the notification.
+    """
+    topic = qp.get("topic") or body.get("topic")
+    mp_type = body.get("type") or qp.get("type")
     resource = body.get("resource") or ""
     data = body.get("data") or {}
 
@@ -355,60 +359,117 @@ async def mp_webhook(request: Request, db: Session = Depends(get_db)):
     # MP can send topic=preapproval or type=preapproval
     if topic in ("preapproval", "subscription_preapproval") or mp_type in ("preapproval", "subscription_preapproval"):
         preapproval_id = (
-            request.query_params.get("id")
+            qp.get("id")
             or data.get("id")
-            or request.query_params.get("data.id")
+            or qp.get("data.id")
             or _extract_id_from_resource_url(resource, "preapproval")
         )
-        if not preapproval_id:
-            return {"ok": True, "ignored": "preapproval_no_id"}
-
-        _maybe_verify_signature(request, data_id=str(preapproval_id))
-
-        pre = await fetch_preapproval(str(preapproval_id))
-        return await _process_preapproval(str(preapproval_id), pre, db)
+        return "preapproval", (str(preapproval_id) if preapproval_id else None)
 
     # 1b) Recurring subscription payments (authorized payments)
     if topic == "subscription_authorized_payment" or mp_type == "subscription_authorized_payment":
         authorized_payment_id = (
-            request.query_params.get("id")
+            qp.get("id")
             or data.get("id")
-            or request.query_params.get("data.id")
+            or qp.get("data.id")
             or _extract_id_from_resource_url(resource, "authorized_payments")
         )
-        if not authorized_payment_id:
-            return {"ok": True, "ignored": "authorized_payment_no_id"}
-
-        _maybe_verify_signature(request, data_id=str(authorized_payment_id))
-        auth = await fetch_authorized_payment(str(authorized_payment_id))
-        return await _process_authorized_payment(str(authorized_payment_id), auth, db)
-
-    # 2) One-time payments / payment events
-    payment_id: str | None = None
+        return "authorized_payment", (str(authorized_payment_id) if authorized_payment_id else None)
 
     # 2a) Direct payment event
-    if mp_type == "payment" or request.query_params.get("type") == "payment":
-        payment_id = data.get("id") or request.query_params.get("data.id") or request.query_params.get("id")
-        payment_id = str(payment_id) if payment_id else None
+    if mp_type == "payment" or qp.get("type") == "payment":
+        payment_id = data.get("id") or qp.get("data.id") or qp.get("id")
+        if payment_id:
+            return "payment", str(payment_id)
 
     # 2b) Merchant order event (IPN style)
-    if not payment_id and topic == "merchant_order":
-        merchant_order_id = request.query_params.get("id") or _extract_id_from_resource_url(resource, "merchant_orders")
-        if not merchant_order_id:
-            return {"ok": True, "ignored": "merchant_order_no_id"}
+    if topic == "merchant_order":
+        merchant_order_id = qp.get("id") or _extract_id_from_resource_url(resource, "merchant_orders")
+        return "merchant_order", (str(merchant_order_id) if merchant_order_id else None)
 
-        # Note: merchant_order signature headers are often missing in sandbox -> optional
-        _maybe_verify_signature(request, data_id=str(merchant_order_id))
+    return None, None
 
-        payment_id, mo = await _resolve_payment_id_from_merchant_order(str(merchant_order_id))
+
+async def process_webhook_event(kind: str, resource_id: str, db: AsyncSession) -> dict[str, Any]:
+    """
+    Fetches the notified resource from MP and runs the matching processor.
+    Called by the inbox workers (app/services/webhook_inbox.py).
+    """
+    # the notification means the cached copy (if any) is stale
+    invalidate_mp_resource(kind, resource_id)
+
+    if kind == "preapproval":
+        pre = await fetch_preapproval(resource_id)
+        return await _process_preapproval(resource_id, pre, db)
+
+    if kind == "authorized_payment":
+        auth = await fetch_authorized_payment(resource_id)
+        return await _process_authorized_payment(resource_id, auth, db)
+
+    payment_id: str | None = resource_id if kind == "payment" else None
+    preference_id: str | None = None
+
+    if kind == "merchant_order":
+        # MP may send merchant_order before payments[] is populated.
+        # Instead of polling here, the inbox re-checks it later on a backoff schedule.
+        mo = await fetch_merchant_order(resource_id)
+        payment_id = _pick_latest_payment_id_from_merchant_order(mo)
+        preference_id = mo.get("preference_id")
         if not payment_id:
-            print("merchant_order had no payments after retries. mo=", mo)
-            return {"ok": True, "ignored": "merchant_order_no_payments_yet"}
+            logger.info("MP merchant order has no payments yet; deferring", extra={"mp_merchant_order_id": resource_id})
+            raise DeferProcessing(
+                settings.merchant_order_recheck_delays_s,
+                {"ok": True, "ignored": "merchant_order_no_payments_yet"},
+            )
 
     if not payment_id:
         return {"ok": True, "ignored": True}
 
-    _maybe_verify_signature(request, data_id=str(payment_id))
+    payment = await fetch_payment(payment_id)
+    return await _process_payment(payment_id, payment, db, preference_id)
 
-    payment = await fetch_payment(str(payment_id))
-    return await _process_payment(str(payment_id), payment, db)
+
+# ---------------------------
+# webhook endpoint
+# ---------------------------
+
+@router.post("/webhook")
+async def mp_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Acknowledge-fast: verify, store the raw notification in the inbox and return.
+    MP fetches and entitlement updates happen in the inbox workers.
+    """
+    qp = dict(request.query_params)
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+
+    logger.debug("MP webhook received", extra={"query_params": qp, "body": body})
+
+    kind, resource_id = _classify_notification(qp, body)
+    if not kind:
+        return {"ok": True, "ignored": True}
+    if not resource_id:
+        return {"ok": True, "ignored": f"{kind}_no_id"}
+
+    # Note: merchant_order signature headers are often missing in sandbox -> optional
+    _maybe_verify_signature(request, data_id=resource_id)
+    invalidate_mp_resource(kind, resource_id)
+
+    request_id = request.headers.get("x-request-id")
+    if await is_duplicate_notification(db, kind=kind, resource_id=resource_id, request_id=request_id, body=body):
+        return {"ok": True, "duplicate": True}
+
+    # commits the dedupe ledger row too (one transaction)
+    event = await enqueue_webhook_event(
+        db,
+        kind=kind,
+        resource_id=resource_id,
+        query_params=qp,
+        body=body,
+        request_id=request_id,
+    )
+    return {"ok": True, "queued": True, "event_id": event.id}
@@ -7,23 +7,118 @@ class Settings(BaseSettings):
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     log_level: str = "info"
+    log_json: bool = True
+    # Fraction of DEBUG records kept (webhook payload dumps etc.)
+    log_debug_sample_rate: float = 0.01
+    # Prometheus-style /metrics endpoint (bearer token from INTERNAL_API_TOKENS)
+    # + per-route latency middleware
+    metrics_enabled: bool = True
+    # Per-request SQL accounting (statement count, DB time, repeated statements)
+    db_query_stats_enabled: bool = True
+    # Adds "X-DB-Queries: <count>; <ms>" to responses (debugging)
+    db_query_stats_header: bool = False
+    # Same statement run this many times in one request is logged as a likely N+1
+    db_query_repeat_threshold: int = 3
+    # Warn when a request runs more statements than this (0 = no budget)
+    db_query_budget: int = 0
+
+    # Request profiler (pyinstrument, speedscope output). Not installed at all unless
+    # profiling_enabled or profiling_token is set.
+    profiling_enabled: bool = False
+    # Requests sending "X-Profile: <token>" are always profiled (works with profiling_enabled off)
+    profiling_token: str = ""
+    # Fraction of requests profiled while enabled
+    profiling_sample_rate: float = 0.01
+    # > 0: profile every request while enabled, keep the ones slower than this
+    profiling_slow_ms: float = 0.0
+    profiling_interval_s: float = 0.001
+    profiling_dir: str = "./profiles"
 
     # Database
     database_url: str = "sqlite:///./dev.db"
     db_echo: bool = False
+    # Optional override; derived from database_url when empty (aiosqlite / asyncpg)
+    async_database_url: str = ""
 
     # JWT
     jwt_secret: str = "secret_key"
     jwt_alg: str = "HS256"
     jwt_access_ttl_min: int = 60
+    # Put the claims routes need (email) in the token so they can skip the users query
+    jwt_embed_claims: bool = True
+    token_denylist_refresh_s: float = 30.0
+    user_cache_max_entries: int = 10000
+
+    # Service-to-service API (/internal); bearer tokens, empty = disabled
+    internal_api_tokens: list[str] = []
+    # user ids per /internal/entitlements/check request (JSON / NDJSON stream)
+    internal_check_max_users: int = 1000
+    internal_check_stream_max_users: int = 100000
+
+    # bcrypt process pool (register/login); beyond max_pending queued jobs -> 503
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+
+    # Premium gating cache (per process; ttl bounds staleness across processes)
+    entitlement_cache_max_users: int = 100000
+    entitlement_cache_ttl_s: float = 300.0
+    # empty result (denied): short, it's what a user sees right after paying
+    entitlement_cache_negative_ttl_s: float = 5.0
+
+    # Expiry sweeper: flips expired active/canceled entitlements to inactive
+    # (0 = don't sweep in this process)
+    expiry_sweep_interval_s: float = 60.0
+    expiry_sweep_batch_size: int = 1000
+
+    # Plan catalog snapshot: how often each process checks the version counter
+    plan_catalog_refresh_s: float = 30.0
+    # Cache-Control max-age for GET /billing/plans
+    plans_cache_max_age_s: int = 300
 
     # Mercado Pago
+    # API base URL; point it at scripts/mp_emulator.py for local load tests
+    mp_api_base: str = "https://api.mercadopago.com"
     mp_access_token: str = ""
     mp_webhook_url: str = ""
     app_base_url: str = "http://localhost:8000"
     mp_currency: str = "MXN"
     mp_webhook_secret: str = ""
 
+    # Mercado Pago HTTP client (shared, pooled)
+    mp_http_timeout_s: float = 20.0
+    mp_http_connect_timeout_s: float = 5.0
+    mp_http_max_connections: int = 50
+    mp_http_max_keepalive_connections: int = 20
+    mp_http_keepalive_expiry_s: float = 30.0
+    mp_http2: bool = False
+
+    # Read-through cache for MP resources (0 entries = disabled)
+    mp_cache_max_entries: int = 10000
+    mp_cache_ttl_payment_s: float = 60.0
+    mp_cache_ttl_preapproval_s: float = 300.0
+    mp_cache_ttl_merchant_order_s: float = 30.0
+
+    # Webhook inbox workers (0 = don't drain in this process)
+    webhook_workers: int = 4
+    webhook_poll_interval_s: float = 2.0
+    webhook_lease_s: float = 120.0
+    webhook_max_attempts: int = 8
+    webhook_retry_base_delay_s: float = 5.0
+    webhook_retry_max_delay_s: float = 600.0
+    # Re-check schedule for merchant orders notified before their payments exist
+    merchant_order_recheck_delays_s: list[float] = [2, 5, 10, 30, 60, 120, 300]
+
+    # Webhook dedupe ledger
+    webhook_dedupe_retention_s: int = 86400
+    webhook_dedupe_purge_interval_s: float = 3600.0
+
+    # MP reconciliation job (scripts/reconcile_mp.py)
+    reconcile_page_size: int = 500
+    reconcile_concurrency: int = 16
+    # MP API calls per second across the whole run (0 = unlimited)
+    reconcile_rate_per_s: float = 50.0
+    reconcile_checkpoint_path: str = "./reconcile_checkpoint.json"
+
     # Tell pydantic to read from .env file
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,202 @@
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Iterable
+
+# Minimal in-process metrics rendered in the Prometheus text format.
+# Each metric has its own lock held only for a dict lookup and a few
+# increments, so recording stays cheap next to the work being measured.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = tuple[str, ...]
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for values, v in items:
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(v)}"
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            item = self._values.get(labelvalues)
+            if item is None:
+                item = self._values[labelvalues] = ([0] * (len(self.buckets) + 1), [0.0])
+            item[0][i] += 1
+            item[1][0] += value
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        return _Timer(self, labelvalues)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, list(counts), s[0]) for k, (counts, s) in self._values.items()]
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("_hist", "_labels", "_start")
+
+    def __init__(self, hist: Histogram, labelvalues: LabelValues):
+        self._hist = hist
+        self._labels = labelvalues
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._hist.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class Gauge(_Metric):
+    """Read at scrape time from a callback returning [(labelvalues, value), ...]."""
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...],
+        collect: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ):
+        super().__init__(name, help_text, labelnames)
+        self._collect = collect
+
+    def _samples(self) -> Iterable[str]:
+        for values, v in self._collect():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(v)}"
+
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# ---------------------------
+# app metrics
+# ---------------------------
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+
+MP_API_DURATION = Histogram(
+    "mp_api_request_duration_seconds",
+    "Mercado Pago API call latency by operation",
+    ("operation",),
+)
+
+MP_API_REQUESTS = Counter(
+    "mp_api_requests_total",
+    "Mercado Pago API calls by operation and HTTP status ('error' = no response)",
+    ("operation", "status"),
+)
+
+WEBHOOK_PROCESSING_DURATION = Histogram(
+    "webhook_processing_duration_seconds",
+    "Inbox webhook processing time by kind and outcome",
+    ("kind", "outcome"),
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled DB connection",
+    ("engine",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 4, 5, 8, 12, 20, 50, 100),
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL per request",
+    ("route",),
+)
+
+DB_REPEATED_QUERIES = Counter(
+    "db_repeated_queries_total",
+    "Requests with a statement repeated past the N+1 threshold",
+    ("route",),
+)
@@ -0,0 +1,175 @@
+import hmac
+import logging
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import anyio.to_thread
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_REPEATED_QUERIES,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+)
+from app.db.query_stats import start_query_stats, stop_query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Records request latency per route template (pure ASGI: no per-request task/body wrapping)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def _send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            # templates (/mp/webhook), never raw paths: keeps label cardinality bounded
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], path, status)
+
+
+class QueryStatsMiddleware:
+    """
+    Per-request SQL accounting: statement count and DB time go to the metrics
+    (and optionally an X-DB-Queries header); statements repeated within one
+    request are logged as likely N+1 patterns, overruns of the query budget too.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_query_stats()
+
+        async def _send(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.db_query_stats_header:
+                value = f"{stats.count}; {stats.total_s * 1000:.1f}ms".encode()
+                message["headers"] = [*message.get("headers", []), (b"x-db-queries", value)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            stop_query_stats(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            DB_QUERIES_PER_REQUEST.observe(stats.count, route)
+            DB_TIME_PER_REQUEST.observe(stats.total_s, route)
+            self._check(scope["method"], route, stats)
+
+    @staticmethod
+    def _check(method: str, route: str, stats) -> None:
+        repeated = stats.repeated(settings.db_query_repeat_threshold)
+        if repeated:
+            DB_REPEATED_QUERIES.inc(route)
+            sql, times = repeated[0]
+            logger.warning("Repeated SQL statement in one request (possible N+1)", extra={
+                "method": method,
+                "route": route,
+                "times": times,
+                "statement": " ".join(sql.split())[:300],
+                "queries": stats.count,
+            })
+        if settings.db_query_budget and stats.count > settings.db_query_budget:
+            logger.warning("Request exceeded its SQL query budget", extra={
+                "method": method,
+                "route": route,
+                "queries": stats.count,
+                "budget": settings.db_query_budget,
+                "db_ms": round(stats.total_s * 1000, 1),
+            })
+
+
+class ProfilerMiddleware:
+    """
+    Wall-clock request profiler. Profiles a request when it sends a valid
+    X-Profile token, when it's sampled, or (with a slow threshold) always,
+    keeping only the outliers. Stacks follow the request's task across awaits.
+    Profiles are written as speedscope JSON (https://www.speedscope.app).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # imported here: pyinstrument is only needed when the profiler is installed
+        from pyinstrument import Profiler
+
+        self._profiler_cls = Profiler
+        self._token = settings.profiling_token.encode()
+        self._dir = Path(settings.profiling_dir)
+
+    def _requested(self, scope: Scope) -> bool:
+        if not self._token:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self._token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        sampled = settings.profiling_enabled and random.random() < settings.profiling_sample_rate
+        watch_slow = settings.profiling_enabled and settings.profiling_slow_ms > 0
+        if not (requested or sampled or watch_slow):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self._profiler_cls(interval=settings.profiling_interval_s, async_mode="enabled")
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if requested or sampled or elapsed_ms >= settings.profiling_slow_ms:
+                await anyio.to_thread.run_sync(self._write, profiler, scope, elapsed_ms)
+
+    def _write(self, profiler: Any, scope: Scope, elapsed_ms: float) -> None:
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        route = getattr(scope.get("route"), "path", None) or scope["path"]
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{slug}-{elapsed_ms:.0f}ms-{uuid.uuid4().hex[:6]}"
+        path = self._dir / f"{name}.speedscope.json"
+        try:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(profiler.output(renderer=SpeedscopeRenderer()))
+        except Exception:
+            logger.exception("Failed to write request profile")
+            return
+        logger.info("Request profile written", extra={
+            "method": scope["method"],
+            "route": route,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "profile": str(path),
+        })
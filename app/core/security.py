@@ -1,8 +1,16 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from app.core.config import settings
 import hashlib
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -15,19 +23,85 @@ def _bcrypt_input(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 def hash_password(password: str) -> str:
-    pre = _bcrypt_input(password)
-    print("DEBUG security.py prehash length:", len(pre), "value starts:", pre[:8])
-    return pwd_context.hash(pre)
+    return pwd_context.hash(_bcrypt_input(password))
 
 def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(_bcrypt_input(password), password_hash)
 
-def create_access_token(subject: str) -> str:
+# ---------------------------
+# bcrypt process pool
+# ---------------------------
+# bcrypt is CPU-bound (~100-300 ms per call). Running it in a dedicated
+# process pool keeps it off the shared AnyIO threadpool and the GIL, so
+# a login burst can't starve the other endpoints.
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the pool already has `password_hash_max_pending` jobs, or
+    its workers died again right after it was recreated.
+    """
+
+_pool: ProcessPoolExecutor | None = None
+_pending = 0
+
+def start_password_pool() -> None:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+def shutdown_password_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+def _replace_broken_pool(broken: ProcessPoolExecutor) -> None:
+    # event loop only (no lock needed); concurrent callers all hold the
+    # same broken pool, only the first one replaces it
+    global _pool
+    if _pool is broken:
+        _pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        start_password_pool()
+
+async def _run_in_pool(fn, *args):
+    global _pending
+    if _pending >= settings.password_hash_max_pending:
+        raise PasswordHasherBusy()
+    start_password_pool()
+    _pending += 1
+    try:
+        # a dead worker breaks the whole pool: recreate it and retry once
+        for attempt in (1, 2):
+            pool = _pool
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            except BrokenProcessPool as exc:
+                logger.warning("Password hashing pool broken; recreating it", extra={"attempt": attempt})
+                _replace_broken_pool(pool)
+                if attempt == 2:
+                    raise PasswordHasherBusy() from exc
+    finally:
+        _pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool(hash_password, password)
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_in_pool(verify_password, password, password_hash)
+
+def create_access_token(subject: str, claims: dict | None = None) -> str:
     # subject = a string that identifies the user (e.g., user ID or email)
+    # claims = extra claims routes can read without a DB hit (e.g., email)
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=settings.jwt_access_ttl_min)
     payload = {
+        **(claims or {}),
         "sub": subject,
+        "jti": uuid4().hex, # token id, used for revocation
         "iat": int(now.timestamp()), # issued at
         "exp": int(exp.timestamp()), # expiration time
     }
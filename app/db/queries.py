@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import ColumnElement, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.entitlement import Entitlement
+
+
+async def get_user_entitlement(db: AsyncSession, user_id: int, plan_id: int) -> Entitlement | None:
+    return await db.scalar(
+        select(Entitlement).where(
+            Entitlement.user_id == user_id,
+            Entitlement.plan_id == plan_id,
+        )
+    )
+
+
+def entitlement_active_clause(now: datetime | ColumnElement[datetime]) -> ColumnElement[bool]:
+    """
+    SQL twin of CachedEntitlement.is_active: active until expires_at (if any),
+    canceled until its paid period ends. The leading status IN lets the
+    (user_id, status, expires_at, plan_id) index narrow the range.
+    `now` may be a bindparam, for statements built once at import.
+    """
+    return and_(
+        Entitlement.status.in_(("active", "canceled")),
+        or_(
+            Entitlement.expires_at >= now,
+            and_(Entitlement.status == "active", Entitlement.expires_at.is_(None)),
+        ),
+    )
+
+
+def entitlement_lapsed_clause(now: datetime | ColumnElement[datetime]) -> ColumnElement[bool]:
+    """
+    Entitlements that granted access which has ended: active/canceled rows
+    (the ones gating looks at) that are canceled or past expires_at.
+    inactive/past_due rows never count, whatever their expires_at.
+    """
+    return and_(
+        Entitlement.status.in_(("active", "canceled")),
+        or_(Entitlement.status == "canceled", Entitlement.expires_at < now),
+    )
@@ -0,0 +1,59 @@
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Statements executed on behalf of one request."""
+    count: int = 0
+    total_s: float = 0.0
+    # SQL text -> executions; the same text run over and over is the N+1 signature
+    statements: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+# The object is shared (not copied) with threadpool calls and the async
+# engine's greenlets, so statements they run are counted too.
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def start_query_stats() -> tuple[QueryStats, Token]:
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def stop_query_stats(token: Token) -> None:
+    _current.reset(token)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.total_s += time.perf_counter() - starts.pop()
+    stats.count += 1
+    stats.statements[statement] += 1
+
+
+def instrument_engine(eng: Engine) -> None:
+    """Counts statements/DB time per request (no-op outside a request scope)."""
+    event.listen(eng, "before_cursor_execute", _before_cursor_execute)
+    event.listen(eng, "after_cursor_execute", _after_cursor_execute)
@@ -1,13 +1,46 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
-from typing import Generator
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT
+from app.db.query_stats import instrument_engine
+from typing import AsyncGenerator, Generator
+
+def _timed_pool_class(base: type, label: str) -> type:
+    class TimedPool(base):
+        # _do_get = take an idle connection, open a new one, or wait for one to be returned
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, label)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+def _pool_options(url: str, label: str) -> dict:
+    """
+    poolclass for create_engine: the dialect's default queue pool, subclassed
+    to record checkout wait (pool events only fire once a connection is out).
+    Other pools (SQLite :memory:, ...) never wait and are left as they are.
+    """
+    u = make_url(url)
+    base = u.get_dialect().get_pool_class(u)
+    if base in (QueuePool, AsyncAdaptedQueuePool):
+        return {"poolclass": _timed_pool_class(base, label)}
+    return {}
 
 # Engine = the DB connection factory
 engine = create_engine(
     settings.database_url,
     echo=settings.db_echo,
-    future=True
+    future=True,
+    **_pool_options(settings.database_url, "sync"),
 )
 
 # SessionLocal = the session factory
@@ -17,10 +50,48 @@ SessionLocal = sessionmaker(
     autocommit=False
 )
 
+def _async_database_url(url: str) -> str:
+    """
+    Maps the sync DATABASE_URL onto its async driver:
+    - sqlite -> sqlite+aiosqlite
+    - postgresql (psycopg2) -> postgresql+asyncpg
+    """
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    elif backend == "postgresql":
+        u = u.set(drivername="postgresql+asyncpg")
+    return u.render_as_string(hide_password=False)
+
+# Async engine for async routes (same database, async driver)
+_ASYNC_DATABASE_URL = settings.async_database_url or _async_database_url(settings.database_url)
+async_engine = create_async_engine(
+    _ASYNC_DATABASE_URL,
+    echo=settings.db_echo,
+    **_pool_options(_ASYNC_DATABASE_URL, "async"),
+)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# AsyncSessionLocal = the async session factory
+# expire_on_commit=False: attributes stay readable after commit without a lazy (sync) reload
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 def get_db() -> Generator[Session, None, None]:
     """Dependency that provides a database session"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that provides an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,122 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+from app.integrations.mp_http import mp_inflight
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with a per-entry TTL.
+    Only used from the event loop, so it isn't locked.
+
+    Invalidations bump a generation counter. Writers pass the generation
+    they read before fetching; a write for a key invalidated since then is
+    dropped, so a fetch that started before a change can't cache the old value.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+        self._generation = 0
+        # key -> generation of its last invalidation (bounded like the entries;
+        # evicted records raise the floor, so an old write is dropped, never kept)
+        self._invalidated: OrderedDict[Any, int] = OrderedDict()
+        self._invalidated_floor = 0
+
+    def get(self, key: Any) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: Any, value: Any, ttl_s: float, generation: int | None = None) -> None:
+        if self.max_entries <= 0 or ttl_s <= 0:
+            return
+        if generation is not None and generation < self._invalidated.get(key, self._invalidated_floor):
+            self.stale_writes += 1
+            return
+        self._data[key] = (time.monotonic() + ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Any) -> None:
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > max(self.max_entries, 1):
+            _, self._invalidated_floor = self._invalidated.popitem(last=False)
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
+
+
+# Read-through cache for MP resources, keyed by (kind, resource_id)
+mp_resource_cache = TTLCache(settings.mp_cache_max_entries)
+
+_TTLS_S = {
+    "payment": settings.mp_cache_ttl_payment_s,
+    "preapproval": settings.mp_cache_ttl_preapproval_s,
+    "merchant_order": settings.mp_cache_ttl_merchant_order_s,
+}
+
+
+def get_cached_mp_resource(kind: str, resource_id: str) -> dict[str, Any] | None:
+    if kind not in _TTLS_S:
+        return None
+    return mp_resource_cache.get((kind, str(resource_id)))
+
+
+def mp_cache_generation() -> int:
+    """Read before fetching a resource; pass it to cache_mp_resource."""
+    return mp_resource_cache.generation
+
+
+def cache_mp_resource(kind: str, resource_id: str, value: dict[str, Any], generation: int | None = None) -> None:
+    ttl_s = _TTLS_S.get(kind)
+    if ttl_s:
+        mp_resource_cache.set((kind, str(resource_id)), value, ttl_s, generation)
+
+
+def invalidate_mp_resource(kind: str, resource_id: str) -> None:
+    """Called when a webhook for the resource arrives or when we PUT to it."""
+    key = (kind, str(resource_id))
+    mp_resource_cache.invalidate(key)
+    # don't let later readers join a GET that started before the change
+    mp_inflight.forget(key)
@@ -0,0 +1,106 @@
+import time
+
+import httpx
+from app.core.config import settings
+from app.core.metrics import MP_API_DURATION, MP_API_REQUESTS
+from app.utils.singleflight import SingleFlight
+
+# One pooled client for the whole app (keep-alive connections are reused
+# across requests instead of paying a new TCP+TLS handshake per MP call).
+_client: httpx.AsyncClient | None = None
+
+# Concurrent GETs for the same (kind, resource_id) share one HTTP call
+mp_inflight = SingleFlight()
+
+
+def _operation(method: str, path: str) -> str:
+    """Metric label for an MP API call, e.g. GET /preapproval/123 -> preapproval_get."""
+    parts = [p for p in path.split("/") if p and p != "v1"]
+    resource = parts[0] if parts else ""
+    name = {
+        "checkout": "preference",
+        "preapproval": "preapproval",
+        "payments": "payment",
+        "merchant_orders": "merchant_order",
+        "authorized_payments": "authorized_payment",
+    }.get(resource, "other")
+    verb = {"GET": "get", "POST": "create", "PUT": "update"}.get(method, method.lower())
+    return f"{name}_{verb}"
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Records latency and status of every MP API call (including timeouts/errors)."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = _operation(request.method, request.url.path)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            MP_API_DURATION.observe(time.perf_counter() - start, operation)
+            MP_API_REQUESTS.inc(operation, status)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _build_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=settings.mp_http_max_connections,
+            max_keepalive_connections=settings.mp_http_max_keepalive_connections,
+            keepalive_expiry=settings.mp_http_keepalive_expiry_s,
+        ),
+        http2=settings.mp_http2,
+    )
+    return httpx.AsyncClient(
+        base_url=settings.mp_api_base,
+        headers={"Authorization": f"Bearer {settings.mp_access_token}"},
+        timeout=httpx.Timeout(
+            settings.mp_http_timeout_s,
+            connect=settings.mp_http_connect_timeout_s,
+        ),
+        transport=_InstrumentedTransport(transport),
+    )
+
+
+async def start_mp_client() -> httpx.AsyncClient:
+    """Creates the shared client. Called from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_mp_client() -> None:
+    """Closes the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_mp_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client.
+    Outside the app lifespan (scripts, shells) it is created lazily.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def mp_get(path: str, key: tuple[str, str]) -> httpx.Response:
+    """
+    GET through the shared client, coalesced per key = (kind, resource_id).
+    e.g. a preapproval notification and several authorized payments of the
+    same subscription arriving together trigger a single /preapproval/{id} call.
+    """
+    return await mp_inflight.do(key, lambda: get_mp_client().get(path))
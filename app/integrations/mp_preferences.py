@@ -0,0 +1,9 @@
+from app.integrations.mp_http import get_mp_client
+
+async def mp_create_preference(payload: dict) -> tuple[int, dict]:
+    """
+    Creates a Checkout Pro preference and returns (status_code, json).
+    Docs: POST /checkout/preferences
+    """
+    r = await get_mp_client().post("/checkout/preferences", json=payload)
+    return r.status_code, (r.json() if r.content else {})
@@ -1,30 +1,30 @@
-import httpx
-from app.core.config import settings
-
-MP_API = "https://api.mercadopago.com"
+from app.integrations.mp_cache import cache_mp_resource, get_cached_mp_resource, invalidate_mp_resource, mp_cache_generation
+from app.integrations.mp_http import get_mp_client, mp_get
 
 async def mp_create_preapproval(payload: dict) -> tuple[int, dict]:
     """
     Creates a subscription (preapproval) and returns (status_code, json).
     Docs: POST /preapproval
     """
-    headers = {"Authorization": f"Bearer {settings.mp_access_token}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(f"{MP_API}/preapproval", json=payload, headers=headers)
+    r = await get_mp_client().post("/preapproval", json=payload)
     return r.status_code, (r.json() if r.content else {})
 
 async def mp_get_preapproval(preapproval_id: str) -> tuple[int, dict]:
-    headers = {"Authorization": f"Bearer {settings.mp_access_token}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(f"{MP_API}/preapproval/{preapproval_id}", headers=headers)
-    return r.status_code, (r.json() if r.content else {})
+    cached = get_cached_mp_resource("preapproval", preapproval_id)
+    if cached is not None:
+        return 200, cached
+    generation = mp_cache_generation()
+    r = await mp_get(f"/preapproval/{preapproval_id}", key=("preapproval", str(preapproval_id)))
+    data = r.json() if r.content else {}
+    if r.status_code == 200:
+        cache_mp_resource("preapproval", preapproval_id, data, generation)
+    return r.status_code, data
 
 async def mp_update_preapproval(preapproval_id: str, payload: dict) -> tuple[int, dict]:
     """
     Updates a subscription (preapproval) and returns (status_code, json).
     Docs: PUT /preapproval/{id}
     """
-    headers = {"Authorization": f"Bearer {settings.mp_access_token}"}
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.put(f"{MP_API}/preapproval/{preapproval_id}", json=payload, headers=headers)
+    r = await get_mp_client().put(f"/preapproval/{preapproval_id}", json=payload)
+    invalidate_mp_resource("preapproval", preapproval_id)
     return r.status_code, (r.json() if r.content else {})
@@ -1,14 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.core.config import settings
+from app.core.logging import setup_logging, shutdown_logging
+from app.core.middleware import MetricsMiddleware, ProfilerMiddleware, QueryStatsMiddleware
+from app.core.security import start_password_pool, shutdown_password_pool
+from app.db.session import async_engine
+from app.integrations.mp_http import start_mp_client, close_mp_client
+from app.services.expiry_sweeper import start_expiry_sweeper, stop_expiry_sweeper
+from app.services.plan_catalog import start_plan_catalog, stop_plan_catalog
+from app.services.webhook_dedupe import start_dedupe_purger, stop_dedupe_purger
+from app.services.webhook_inbox import start_webhook_workers, stop_webhook_workers
 
 # Import routers
 from app.api.auth import router as auth_router
 from app.api.billing import router as billing_router
-from app.api.mp_webhook import router as mp_webhook_router
+from app.api.internal import router as internal_router
+from app.api.metrics import router as metrics_router
+from app.api.mp_webhook import router as mp_webhook_router, process_webhook_event
 from app.api.premium import router as premium_router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Structured, queue-backed logging (request path never blocks on stdout)
+    setup_logging()
+    # Shared pooled HTTP client for Mercado Pago API calls
+    await start_mp_client()
+    # Dedicated process pool for bcrypt
+    start_password_pool()
+    # In-memory plan catalog, reloaded when its DB version changes
+    await start_plan_catalog()
+    # Background workers draining the webhook inbox
+    start_webhook_workers(process_webhook_event)
+    start_dedupe_purger()
+    # Materializes expiry into entitlements.status
+    start_expiry_sweeper()
+    try:
+        yield
+    finally:
+        await stop_expiry_sweeper()
+        await stop_plan_catalog()
+        await stop_dedupe_purger()
+        await stop_webhook_workers()
+        await close_mp_client()
+        # waits for the worker processes: off the event loop
+        await asyncio.to_thread(shutdown_password_pool)
+        shutdown_logging()
+        await async_engine.dispose()
+
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.app_name)
+    app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
     @app.get("/health")
     def health():
@@ -22,6 +64,17 @@ def create_app() -> FastAPI:
     app.include_router(mp_webhook_router)
     # Include premium feature routes
     app.include_router(premium_router)
+    # Service-to-service routes (INTERNAL_API_TOKENS)
+    app.include_router(internal_router)
+
+    if settings.db_query_stats_enabled:
+        app.add_middleware(QueryStatsMiddleware)
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(metrics_router)
+    # Added last = outermost, so profiles include the other middleware
+    if settings.profiling_enabled or settings.profiling_token:
+        app.add_middleware(ProfilerMiddleware)
     
     return app
 
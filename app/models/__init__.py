@@ -1,5 +1,9 @@
 from .user import User
 from .plan import Plan
 from .entitlement import Entitlement
+from .webhook_event import WebhookEvent
+from .webhook_dedupe import WebhookDedupe
+from .revoked_token import RevokedToken
+from .catalog_version import CatalogVersion
 
-__all__ = ["User", "Plan", "Entitlement"]
\ No newline at end of file
+__all__ = ["User", "Plan", "Entitlement", "WebhookEvent", "WebhookDedupe", "RevokedToken", "CatalogVersion"]
@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy import DateTime, String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class CatalogVersion(Base):
+    """
+    Generation counters for data cached in memory by the app.
+    e.g. name="plans" is bumped whenever the plans table changes,
+    so every process reloads its plan catalog snapshot.
+    """
+    __tablename__ = "catalog_versions"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
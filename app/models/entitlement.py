@@ -23,9 +23,11 @@ class Entitlement(Base):
     expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Mercado Pago Preferences (nullable because not all apply)
-    mp_preference_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
-    mp_payment_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
-    mp_preapproval_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Indexed: webhooks fall back to these when MP payloads lack our reference
+    mp_preference_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    mp_payment_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # one subscription per entitlement
+    mp_preapproval_id: Mapped[str | None] = mapped_column(String(64), nullable=True, unique=True, index=True)
 
     created_at : Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
@@ -36,5 +38,12 @@ class Entitlement(Base):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'plan_id', name='uq_entitlements_user_plan'),
-        Index("ix_entitlements_user_status","user_id","status")
+        # gating: covers the whole lookup (id via INCLUDE on postgres, rowid on sqlite)
+        Index(
+            "ix_entitlements_user_status_expires_plan",
+            "user_id", "status", "expires_at", "plan_id",
+            postgresql_include=["id"],
+        ),
+        # expiry sweeper: active/canceled rows past expires_at
+        Index("ix_entitlements_status_expires_at","status","expires_at"),
     )
\ No newline at end of file
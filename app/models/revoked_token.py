@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class RevokedToken(Base):
+    """Denylist of access tokens (by jti) revoked before they expire."""
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    # Same as the token's exp: past this the row is useless and can be purged
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    revoked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import DateTime, String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class WebhookDedupe(Base):
+    """
+    Ledger of MP notifications already accepted, used to drop
+    redundant copies (retries, IPN + webhook, topic= + type= styles)
+    before they reach the inbox.
+    """
+    __tablename__ = "webhook_dedupe"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    # sha256 of (kind, resource id, x-request-id or normalized body)
+    dedupe_key: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+
+    kind: Mapped[str] = mapped_column(String(32))
+    resource_id: Mapped[str] = mapped_column(String(64))
+
+    # Number of copies absorbed after the first one
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, index=True)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
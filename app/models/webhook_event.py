@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Any
+from sqlalchemy import Enum, DateTime, String, Integer, Text, JSON, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+class WebhookEvent(Base):
+    """
+    Durable inbox for Mercado Pago notifications.
+    The webhook endpoint only stores the raw notification here;
+    background workers drain it through the webhook processors.
+    """
+    __tablename__ = "webhook_events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    # Normalized resource kind: "payment", "preapproval", "authorized_payment", "merchant_order"
+    kind: Mapped[str] = mapped_column(String(32))
+    resource_id: Mapped[str] = mapped_column(String(64))
+
+    # Raw notification as received
+    query_params: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict)
+    body: Mapped[dict[str, Any]] = mapped_column(JSON, default=dict)
+    request_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+
+    # Processing state
+    status: Mapped[str] = mapped_column(
+        Enum("pending", "processing", "done", "failed", name="webhook_event_status"),
+        default="pending",
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Times processing was postponed on purpose (e.g. merchant order without payments yet)
+    defer_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    result: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
+
+    # When the event may be picked up (again)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    # Lease held by the worker processing it; expired leases are picked up again
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_events_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_webhook_events_kind_resource", "kind", "resource_id"),
+    )
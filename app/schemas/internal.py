@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+class EntitlementCheckIn(BaseModel):
+    user_ids: list[int] = Field(min_length=1)
+    # only these plans count (default: any plan)
+    plan_codes: list[str] | None = None
+
+class EntitlementCheckOut(BaseModel):
+    # user id -> codes of the plans granting access right now (empty = no access)
+    users: dict[int, list[str]]
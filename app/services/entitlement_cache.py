@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.utils.dt import as_utc_aware
+
+
+@dataclass(frozen=True, slots=True)
+class CachedEntitlement:
+    id: int
+    plan_code: str
+    status: str
+    expires_at: datetime | None
+
+    def is_active(self, now: datetime) -> bool:
+        if self.status == "canceled" and not self.expires_at:
+            return False
+        return not (self.expires_at and self.expires_at < now)
+
+
+class EntitlementCache:
+    """
+    Per-user snapshot of the entitlements granting access (empty = none).
+    An entry lives until the earliest future expires_at among them
+    (so an expiry is never missed) and at most `ttl_s`, which bounds
+    staleness across processes; empty entries (a denial, what a user sees
+    right after paying) only `negative_ttl_s`. Writers invalidate it on commit.
+    The gating dependency runs in the threadpool, hence the lock.
+
+    Invalidations bump a generation counter, as in app/integrations/mp_cache.py:
+    readers take it before loading and pass it to `set`, which drops the write
+    if the user was invalidated meanwhile (rows loaded before that commit).
+    """
+
+    def __init__(self, max_users: int, ttl_s: float, negative_ttl_s: float):
+        self.max_users = max_users
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._data: OrderedDict[int, tuple[datetime, tuple[CachedEntitlement, ...]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # user_id -> generation of its last invalidation (bounded; evicted
+        # records raise the floor, so an old write is dropped, never kept)
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._invalidated_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_writes = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int, now: datetime) -> tuple[CachedEntitlement, ...] | None:
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return item[1]
+
+    def set(
+        self,
+        user_id: int,
+        ents: tuple[CachedEntitlement, ...],
+        now: datetime,
+        generation: int | None = None,
+    ) -> None:
+        if self.max_users <= 0:
+            return
+        valid_until = now + timedelta(seconds=self.ttl_s if ents else self.negative_ttl_s)
+        for ent in ents:
+            if ent.expires_at and now < ent.expires_at < valid_until:
+                valid_until = ent.expires_at
+        with self._lock:
+            if generation is not None and generation < self._invalidated.get(user_id, self._invalidated_floor):
+                self.stale_writes += 1
+                return
+            self._data[user_id] = (valid_until, ents)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_users:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidated[user_id] = self._generation
+            self._invalidated.move_to_end(user_id)
+            while len(self._invalidated) > max(self.max_users, 1):
+                _, self._invalidated_floor = self._invalidated.popitem(last=False)
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "stale_writes": self.stale_writes}
+
+
+entitlement_cache = EntitlementCache(
+    settings.entitlement_cache_max_users,
+    settings.entitlement_cache_ttl_s,
+    settings.entitlement_cache_negative_ttl_s,
+)
+
+
+def to_cached_entitlement(ent_id: int, plan_code: str, status: str, expires_at: datetime | None) -> CachedEntitlement:
+    return CachedEntitlement(id=ent_id, plan_code=plan_code, status=status, expires_at=as_utc_aware(expires_at))
+
+
+def invalidate_user_entitlements(user_id: int) -> None:
+    """Call after committing a change to any of the user's entitlements."""
+    entitlement_cache.invalidate(user_id)
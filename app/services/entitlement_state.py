@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from app.models.entitlement import Entitlement
+from app.services.plan_catalog import get_plan_catalog
+from app.utils.dt import parse_iso_datetime
+
+# State transitions driven by MP resources. They only mutate the loaded
+# entitlement; callers commit (one per webhook, or per batch when reconciling)
+# and invalidate the gating cache afterwards.
+
+
+def apply_payment_state(ent: Entitlement, payment_id: str, payment: dict[str, Any]) -> dict[str, Any]:
+    status = payment.get("status")  # approved / pending / rejected
+    status_detail = payment.get("status_detail")
+    plan = get_plan_catalog().by_id.get(ent.plan_id)
+    one_time = bool(plan and plan.kind == "one_time" and plan.access_duration_days)
+
+    # idempotency
+    if ent.mp_payment_id == str(payment_id):
+        if ent.status == "active":
+            return {"ok": True, "idempotent": True}
+        # this payment already opened its access window (now over and swept
+        # to inactive): a redelivered approval must not open a new one
+        if status == "approved" and one_time and ent.expires_at is not None:
+            return {"ok": True, "idempotent": True}
+
+    ent.mp_payment_id = str(payment_id)
+
+    if status == "approved":
+        ent.status = "active"
+
+        # one_time -> expiry
+        if one_time:
+            ent.expires_at = datetime.now(timezone.utc) + timedelta(days=int(plan.access_duration_days))
+        else:
+            # recurring via payment doesn't set expires; keep None
+            pass
+        return {"ok": True, "activated": True}
+
+    # not approved => no access
+    ent.status = "inactive"
+    if one_time:
+        # no window granted by this payment (keeps the guard above exact)
+        ent.expires_at = None
+    return {"ok": True, "activated": False, "mp_status": status, "mp_status_detail": status_detail}
+
+
+def apply_preapproval_state(ent: Entitlement, preapproval_id: str, pre: dict[str, Any]) -> dict[str, Any]:
+    status = pre.get("status")  # authorized / paused / cancelled / pending
+    ent.mp_preapproval_id = str(preapproval_id)
+
+    auto = pre.get("auto_recurring") or {}
+    end_date = auto.get("end_date") or pre.get("next_payment_date")
+    end_dt = parse_iso_datetime(end_date)
+
+    # Our gating truth: active only when authorized/active
+    if status in ("authorized", "active"):
+        ent.status = "active"
+        # keep local period end in sync if MP provides it
+        if end_dt:
+            ent.expires_at = end_dt
+    elif status in ("cancelled", "canceled"):
+        ent.status = "canceled"
+        ent.expires_at = end_dt or ent.expires_at
+    elif status == "paused":
+        ent.status = "inactive"
+        ent.expires_at = None
+    else:
+        # pending / etc -> keep inactive
+        ent.status = "inactive"
+
+    return {"ok": True, "topic": "preapproval", "mp_status": status, "ent_status": ent.status}
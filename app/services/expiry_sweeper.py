@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.entitlement import Entitlement
+from app.services.entitlement_cache import invalidate_user_entitlements
+
+logger = logging.getLogger(__name__)
+
+# Statuses that still grant access until expires_at
+_EXPIRING_STATUSES = ("active", "canceled")
+
+_sweep_task: asyncio.Task | None = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def sweep_expired_entitlements(batch_size: int | None = None) -> int:
+    """
+    Flips active/canceled entitlements whose expires_at has passed to
+    inactive, so `status` alone tells who has access. One set-based UPDATE
+    per batch (picked through ix_entitlements_status_expires_at), committed
+    per batch to keep locks short. Returns the number of rows flipped.
+    """
+    batch_size = batch_size or settings.expiry_sweep_batch_size
+    now = _utcnow()
+    expired = (
+        Entitlement.status.in_(_EXPIRING_STATUSES),
+        Entitlement.expires_at.is_not(None),
+        Entitlement.expires_at < now,
+    )
+    batch_ids = select(Entitlement.id).where(*expired).order_by(Entitlement.expires_at).limit(batch_size)
+
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                update(Entitlement)
+                # conditions repeated: a webhook may have renewed the row meanwhile
+                .where(Entitlement.id.in_(batch_ids.scalar_subquery()), *expired)
+                .values(status="inactive", updated_at=now)
+                .returning(Entitlement.user_id)
+                .execution_options(synchronize_session=False)
+            )
+            user_ids = res.scalars().all()
+            await db.commit()
+
+        for user_id in set(user_ids):
+            invalidate_user_entitlements(user_id)
+        total += len(user_ids)
+        if len(user_ids) < batch_size:
+            break
+
+    if total:
+        logger.info("Expired entitlements swept", extra={"count": total})
+    return total
+
+
+async def _sweep_loop() -> None:
+    while True:
+        try:
+            await sweep_expired_entitlements()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Entitlement expiry sweep failed")
+        await asyncio.sleep(settings.expiry_sweep_interval_s)
+
+
+def start_expiry_sweeper() -> None:
+    global _sweep_task
+    if _sweep_task is None and settings.expiry_sweep_interval_s > 0:
+        _sweep_task = asyncio.create_task(_sweep_loop(), name="entitlement-expiry-sweep")
+
+
+async def stop_expiry_sweeper() -> None:
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        await asyncio.gather(_sweep_task, return_exceptions=True)
+        _sweep_task = None
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Mapping
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.models.catalog_version import CatalogVersion
+from app.models.plan import Plan
+
+logger = logging.getLogger(__name__)
+
+PLANS_CATALOG = "plans"
+
+
+@dataclass(frozen=True, slots=True)
+class PlanRecord:
+    id: int
+    code: str
+    name: str | None
+    kind: str
+    price: Decimal
+    currency: str
+    access_duration_days: int | None
+    interval_count: int | None
+    interval_unit: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class PlanCatalog:
+    """Immutable snapshot of the plans table. Swapped as a whole on reload."""
+    version: int
+    plans: tuple[PlanRecord, ...]  # ordered by kind, price (as /billing/plans lists them)
+    by_code: Mapping[str, PlanRecord]
+    by_id: Mapping[int, PlanRecord]
+
+
+_catalog: PlanCatalog | None = None
+_refresh_task: asyncio.Task | None = None
+
+_PLANS_QUERY = select(Plan).order_by(Plan.kind, Plan.price)
+_VERSION_QUERY = select(CatalogVersion.version).where(CatalogVersion.name == PLANS_CATALOG)
+
+
+def _build_catalog(version: int, plans: list[Plan]) -> PlanCatalog:
+    records = tuple(
+        PlanRecord(
+            id=p.id,
+            code=p.code,
+            name=p.name,
+            kind=p.kind,
+            price=p.price,
+            currency=p.currency,
+            access_duration_days=p.access_duration_days,
+            interval_count=p.interval_count,
+            interval_unit=p.interval_unit,
+        )
+        for p in plans
+    )
+    return PlanCatalog(
+        version=version,
+        plans=records,
+        by_code=MappingProxyType({r.code: r for r in records}),
+        by_id=MappingProxyType({r.id: r for r in records}),
+    )
+
+
+async def load_plan_catalog() -> PlanCatalog:
+    global _catalog
+    async with AsyncSessionLocal() as db:
+        version = await db.scalar(_VERSION_QUERY) or 0
+        plans = (await db.scalars(_PLANS_QUERY)).all()
+    _catalog = _build_catalog(version, list(plans))
+    return _catalog
+
+
+def _load_plan_catalog_sync() -> PlanCatalog:
+    global _catalog
+    with SessionLocal() as db:
+        version = db.scalar(_VERSION_QUERY) or 0
+        plans = db.scalars(_PLANS_QUERY).all()
+    _catalog = _build_catalog(version, list(plans))
+    return _catalog
+
+
+def get_plan_catalog() -> PlanCatalog:
+    """
+    Current snapshot. Loaded at startup by the lifespan;
+    outside of it (scripts, shells) it is loaded on first use.
+    """
+    return _catalog if _catalog is not None else _load_plan_catalog_sync()
+
+
+async def refresh_plan_catalog_if_changed() -> bool:
+    async with AsyncSessionLocal() as db:
+        version = await db.scalar(_VERSION_QUERY) or 0
+    if _catalog is not None and version == _catalog.version:
+        return False
+    await load_plan_catalog()
+    return True
+
+
+def bump_plan_catalog_version(db: Session) -> None:
+    """Call in the same transaction as any change to plans."""
+    row = db.get(CatalogVersion, PLANS_CATALOG)
+    if row:
+        row.version += 1
+    else:
+        db.add(CatalogVersion(name=PLANS_CATALOG, version=1))
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.plan_catalog_refresh_s)
+        try:
+            await refresh_plan_catalog_if_changed()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Plan catalog refresh failed")
+
+
+async def start_plan_catalog() -> None:
+    global _refresh_task
+    await load_plan_catalog()
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop(), name="plan-catalog-refresh")
+
+
+async def stop_plan_catalog() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
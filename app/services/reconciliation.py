@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import or_, select
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.integrations.mp_cache import cache_mp_resource, mp_cache_generation
+from app.integrations.mp_http import mp_get
+from app.models.entitlement import Entitlement
+from app.services.entitlement_cache import invalidate_user_entitlements
+from app.services.entitlement_state import apply_payment_state, apply_preapproval_state
+from app.services.plan_catalog import get_plan_catalog
+from app.utils.dt import as_utc_aware
+from app.utils.ratelimit import AsyncRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# 429 / 5xx from MP are retried this many times (honouring Retry-After)
+_MAX_ATTEMPTS = 4
+
+
+@dataclass
+class ReconcileStats:
+    scanned: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    skipped: int = 0     # one-time access already over: nothing to reconcile
+    not_found: int = 0   # MP doesn't know the stored id
+    concurrent: int = 0  # updated (e.g. by a webhook) while its MP state was being fetched
+    errors: int = 0
+    pages: int = 0
+
+
+class MPFetchError(Exception):
+    pass
+
+
+def load_checkpoint(path: str) -> dict[str, Any] | None:
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, data: dict[str, Any]) -> None:
+    # write + rename, so a crash never leaves a truncated checkpoint
+    tmp = f"{path}.tmp"
+    Path(tmp).write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+async def _fetch_mp(kind: str, resource_id: str, path: str, limiter: AsyncRateLimiter) -> dict[str, Any] | None:
+    """Fresh read (the cache is refreshed, not consulted). None when MP returns 404."""
+    for attempt in range(1, _MAX_ATTEMPTS + 1):
+        await limiter.acquire()
+        generation = mp_cache_generation()
+        r = await mp_get(path, (kind, resource_id))
+        if r.status_code == 200:
+            data = r.json()
+            cache_mp_resource(kind, resource_id, data, generation)
+            return data
+        if r.status_code == 404:
+            return None
+        if (r.status_code == 429 or r.status_code >= 500) and attempt < _MAX_ATTEMPTS:
+            try:
+                delay = float(r.headers.get("retry-after", ""))
+            except ValueError:
+                delay = 0.5 * 2 ** attempt
+            await asyncio.sleep(delay)
+            continue
+        raise MPFetchError(f"{path}: MP returned {r.status_code}")
+    raise MPFetchError(f"{path}: retries exhausted")
+
+
+# Page read: just what picking the MP resource needs, no ORM objects
+_PAGE_COLUMNS = (
+    Entitlement.id,
+    Entitlement.plan_id,
+    Entitlement.status,
+    Entitlement.expires_at,
+    Entitlement.mp_payment_id,
+    Entitlement.mp_preapproval_id,
+    Entitlement.updated_at,
+)
+
+
+def _snapshot(ent: Any) -> tuple:
+    # works on page rows and entitlements alike
+    return ent.status, as_utc_aware(ent.expires_at), ent.mp_payment_id, ent.mp_preapproval_id
+
+
+def _changed_since(ent: Entitlement, row: Any) -> bool:
+    return _snapshot(ent) != _snapshot(row) or as_utc_aware(ent.updated_at) != as_utc_aware(row.updated_at)
+
+
+async def _fetch_one(
+    row: Any,
+    sem: asyncio.Semaphore,
+    limiter: AsyncRateLimiter,
+    now: datetime,
+) -> tuple[str, str, dict[str, Any]] | str:
+    """
+    Fetches the MP resource behind a page row (no DB session held).
+    Returns (kind, resource_id, data) to apply, or the outcome name.
+    """
+    # subscriptions: the preapproval is the source of truth (mp_payment_id is just its last charge)
+    if row.mp_preapproval_id:
+        kind, resource_id = "preapproval", row.mp_preapproval_id
+        path = f"/preapproval/{resource_id}"
+    else:
+        plan = get_plan_catalog().by_id.get(row.plan_id)
+        expires_at = as_utc_aware(row.expires_at)
+        if plan and plan.kind == "one_time" and expires_at and expires_at < now:
+            # re-applying the approved payment would grant a fresh access window
+            return "skipped"
+        kind, resource_id = "payment", row.mp_payment_id
+        path = f"/v1/payments/{resource_id}"
+
+    try:
+        async with sem:
+            data = await _fetch_mp(kind, str(resource_id), path, limiter)
+    except Exception as exc:
+        logger.warning("Reconciliation fetch failed", extra={
+            "entitlement_id": row.id,
+            "kind": kind,
+            "mp_resource_id": resource_id,
+            "error": repr(exc),
+        })
+        return "errors"
+    if data is None:
+        return "not_found"
+    return kind, str(resource_id), data
+
+
+def _apply_one(ent: Entitlement | None, row: Any, fetched: tuple[str, str, dict[str, Any]]) -> str:
+    """Applies the fetched MP state to the re-read entitlement. Returns the outcome name."""
+    if ent is None or _changed_since(ent, row):
+        # deleted, or a webhook (or the sweeper) updated it after the page
+        # read: its state is at least as new as what we fetched
+        return "concurrent"
+    kind, resource_id, data = fetched
+    before = _snapshot(ent)
+    if kind == "preapproval":
+        apply_preapproval_state(ent, resource_id, data)
+    else:
+        apply_payment_state(ent, resource_id, data)
+    return "changed" if _snapshot(ent) != before else "unchanged"
+
+
+async def reconcile_entitlements(
+    *,
+    page_size: int | None = None,
+    concurrency: int | None = None,
+    rate_per_s: float | None = None,
+    checkpoint_path: str | None = None,
+    restart: bool = False,
+    dry_run: bool = False,
+) -> ReconcileStats:
+    """
+    Walks entitlements that reference an MP preapproval or payment in id
+    order (keyset pages, streamed), fetches their current MP state with
+    bounded concurrency and rate, applies the webhook state transitions and
+    commits once per page. No DB session is held during the MP calls: each
+    page is read in one short transaction and applied in another, skipping
+    rows changed in between. Progress is checkpointed after every page, so
+    an interrupted run resumes where it stopped.
+    """
+    page_size = page_size or settings.reconcile_page_size
+    concurrency = concurrency or settings.reconcile_concurrency
+    rate_per_s = settings.reconcile_rate_per_s if rate_per_s is None else rate_per_s
+    checkpoint_path = checkpoint_path or settings.reconcile_checkpoint_path
+
+    stats = ReconcileStats()
+    last_id = 0
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint and not checkpoint.get("completed"):
+        last_id = int(checkpoint["last_id"])
+        stats = ReconcileStats(**checkpoint.get("stats", {}))
+        logger.info("Resuming reconciliation", extra={"last_id": last_id})
+
+    sem = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(rate_per_s, burst=concurrency)
+    started = time.perf_counter()
+
+    while True:
+        stmt = (
+            select(*_PAGE_COLUMNS)
+            .where(
+                or_(Entitlement.mp_preapproval_id.is_not(None), Entitlement.mp_payment_id.is_not(None)),
+                Entitlement.id > last_id,
+            )
+            .order_by(Entitlement.id)
+            .limit(page_size)
+            .execution_options(yield_per=page_size)
+        )
+        # 1) short read; nothing is held open during the MP calls
+        async with AsyncSessionLocal() as db:
+            rows = [row async for row in await db.stream(stmt)]
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        # 2) MP fetches, bounded concurrency and rate
+        now = datetime.now(timezone.utc)
+        fetched = await asyncio.gather(*(_fetch_one(r, sem, limiter, now) for r in rows))
+
+        # 3) short write: re-read (locked) and apply only rows unchanged since step 1
+        to_apply = {r.id: (r, f) for r, f in zip(rows, fetched) if not isinstance(f, str)}
+        results: dict[int, str] = {}
+        if to_apply:
+            async with AsyncSessionLocal() as db:
+                ents = {
+                    e.id: e
+                    for e in await db.scalars(
+                        select(Entitlement).where(Entitlement.id.in_(to_apply)).with_for_update()
+                    )
+                }
+                results = {ent_id: _apply_one(ents.get(ent_id), row, f) for ent_id, (row, f) in to_apply.items()}
+                changed_users = {ents[i].user_id for i, o in results.items() if o == "changed"}
+                if dry_run:
+                    await db.rollback()
+                else:
+                    await db.commit()
+            if not dry_run:
+                for user_id in changed_users:
+                    invalidate_user_entitlements(user_id)
+        outcomes = [f if isinstance(f, str) else results[r.id] for r, f in zip(rows, fetched)]
+
+        stats.pages += 1
+        stats.scanned += len(rows)
+        for outcome in outcomes:
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+        if not dry_run:
+            save_checkpoint(checkpoint_path, {
+                "last_id": last_id,
+                "completed": False,
+                "stats": asdict(stats),
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            })
+        logger.info("Reconciliation page done", extra={
+            "last_id": last_id,
+            "elapsed_s": round(time.perf_counter() - started, 1),
+            "dry_run": dry_run,
+            **asdict(stats),
+        })
+
+    if not dry_run:
+        # the next run starts a fresh pass
+        save_checkpoint(checkpoint_path, {
+            "last_id": last_id,
+            "completed": True,
+            "stats": asdict(stats),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+    return stats
@@ -0,0 +1,47 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.revoked_token import RevokedToken
+
+# Small in-memory copy of the unexpired denylist, reloaded every
+# `token_denylist_refresh_s` (revocations from other processes show up within that).
+_revoked: frozenset[str] = frozenset()
+# -inf: monotonic time can be below the refresh interval on a fresh host
+_loaded_at: float = float("-inf")
+_lock = threading.Lock()
+
+
+def _reload(db: Session) -> None:
+    global _revoked, _loaded_at
+    now = datetime.now(timezone.utc)
+    jtis = db.scalars(select(RevokedToken.jti).where(RevokedToken.expires_at > now)).all()
+    _revoked = frozenset(jtis)
+    _loaded_at = time.monotonic()
+
+
+def is_token_revoked(db: Session, jti: str | None) -> bool:
+    if not jti:
+        return False
+    if time.monotonic() - _loaded_at > settings.token_denylist_refresh_s:
+        with _lock:
+            # another thread may have reloaded while we waited
+            if time.monotonic() - _loaded_at > settings.token_denylist_refresh_s:
+                _reload(db)
+    return jti in _revoked
+
+
+def revoke_token(db: Session, jti: str, expires_at: datetime) -> None:
+    global _revoked
+    now = datetime.now(timezone.utc)
+    # housekeeping: expired entries are useless
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    if not db.get(RevokedToken, jti):
+        db.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=now))
+    db.commit()
+    with _lock:
+        _revoked = _revoked | {jti}
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.webhook_dedupe import WebhookDedupe
+from app.models.webhook_event import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Counters since process start (absorbed = not enqueued, no MP fetch)
+dedupe_stats: dict[str, int] = {
+    "checked": 0,
+    "duplicates": 0,   # same key already in the ledger
+    "coalesced": 0,    # an unprocessed inbox event for the same resource already exists
+}
+
+_purge_task: asyncio.Task | None = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalized_body_hash(body: dict[str, Any]) -> str:
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def webhook_dedupe_key(kind: str, resource_id: str, request_id: str | None, body: dict[str, Any]) -> str | None:
+    """
+    Key for one notification delivery:
+    - x-request-id when MP sends it (retries reuse it)
+    - otherwise the normalized body (webhook bodies carry their own id/date/action)
+    IPN-style notifications without either get no key: they only carry
+    the resource id, so a later, different event would look identical.
+    """
+    if request_id:
+        discriminator = f"rid:{request_id}"
+    elif body:
+        discriminator = f"body:{_normalized_body_hash(body)}"
+    else:
+        return None
+    raw = f"{kind}:{resource_id}:{discriminator}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def is_duplicate_notification(
+    db: AsyncSession,
+    *,
+    kind: str,
+    resource_id: str,
+    request_id: str | None,
+    body: dict[str, Any],
+) -> bool:
+    """
+    True when the notification adds nothing new and can be dropped:
+    - it was already accepted within the retention window, or
+    - an inbox event for the same resource is still waiting; processing
+      fetches the current MP state, so one pending event covers both.
+    Otherwise adds it to the ledger and returns False. The ledger row is
+    flushed, not committed: the caller commits it together with the inbox
+    event, so a failed enqueue doesn't leave the retry looking like a
+    duplicate.
+    """
+    dedupe_stats["checked"] += 1
+    now = _utcnow()
+
+    pending_id = await db.scalar(
+        select(WebhookEvent.id).where(
+            WebhookEvent.kind == kind,
+            WebhookEvent.resource_id == resource_id,
+            WebhookEvent.status == "pending",
+            WebhookEvent.attempts == 0,
+        ).limit(1)
+    )
+    if pending_id:
+        # a deferred event (e.g. merchant order re-check) is re-checked right away
+        await db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id == pending_id, WebhookEvent.next_attempt_at > now)
+            .values(next_attempt_at=now)
+        )
+        await db.commit()
+        dedupe_stats["coalesced"] += 1
+        return True
+
+    key = webhook_dedupe_key(kind, resource_id, request_id, body)
+    if key is None:
+        return False
+
+    cutoff = now - timedelta(seconds=settings.webhook_dedupe_retention_s)
+    res = await db.execute(
+        update(WebhookDedupe)
+        .where(WebhookDedupe.dedupe_key == key, WebhookDedupe.created_at >= cutoff)
+        .values(hits=WebhookDedupe.hits + 1, last_seen_at=now)
+    )
+    if res.rowcount:
+        await db.commit()
+        dedupe_stats["duplicates"] += 1
+        return True
+
+    # new (or expired but not purged yet) -> (re)start its window
+    await db.execute(delete(WebhookDedupe).where(WebhookDedupe.dedupe_key == key))
+    db.add(WebhookDedupe(
+        dedupe_key=key,
+        kind=kind,
+        resource_id=resource_id,
+        hits=0,
+        created_at=now,
+        last_seen_at=now,
+    ))
+    try:
+        await db.flush()
+    except IntegrityError:
+        # a concurrent copy won the insert
+        await db.rollback()
+        dedupe_stats["duplicates"] += 1
+        return True
+    return False
+
+
+async def purge_webhook_dedupe() -> int:
+    """Deletes ledger rows older than the retention window."""
+    cutoff = _utcnow() - timedelta(seconds=settings.webhook_dedupe_retention_s)
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(delete(WebhookDedupe).where(WebhookDedupe.created_at < cutoff))
+        await db.commit()
+        return res.rowcount or 0
+
+
+async def _purge_loop() -> None:
+    while True:
+        try:
+            await purge_webhook_dedupe()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Webhook dedupe purge failed")
+        await asyncio.sleep(settings.webhook_dedupe_purge_interval_s)
+
+
+def start_dedupe_purger() -> None:
+    global _purge_task
+    if _purge_task is None:
+        _purge_task = asyncio.create_task(_purge_loop(), name="webhook-dedupe-purge")
+
+
+async def stop_dedupe_purger() -> None:
+    global _purge_task
+    if _purge_task is not None:
+        _purge_task.cancel()
+        await asyncio.gather(_purge_task, return_exceptions=True)
+        _purge_task = None
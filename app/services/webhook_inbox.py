@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import WEBHOOK_PROCESSING_DURATION
+from app.db.session import AsyncSessionLocal
+from app.models.webhook_event import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# (kind, resource_id, db) -> processor result
+WebhookHandler = Callable[[str, str, AsyncSession], Awaitable[dict[str, Any]]]
+
+
+class DeferProcessing(Exception):
+    """
+    Raised by a handler when the resource isn't ready yet.
+    The event is re-checked after the next delay of `delays_s`
+    (persisted in the row, so it survives restarts) instead of counting as a failure.
+    Once the schedule is exhausted the event is closed with `result`.
+    """
+
+    def __init__(self, delays_s: list[float], result: dict[str, Any]):
+        super().__init__(result)
+        self.delays_s = delays_s
+        self.result = result
+
+
+_tasks: list[asyncio.Task] = []
+_wakeup: asyncio.Event | None = None
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    # exponential backoff, capped
+    delay = settings.webhook_retry_base_delay_s * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.webhook_retry_max_delay_s))
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(WebhookEvent.status == "pending", WebhookEvent.next_attempt_at <= now),
+        # a worker died mid-event (crash/restart): its lease expired
+        and_(WebhookEvent.status == "processing", WebhookEvent.locked_until < now),
+    )
+
+
+async def enqueue_webhook_event(
+    db: AsyncSession,
+    *,
+    kind: str,
+    resource_id: str,
+    query_params: dict[str, Any],
+    body: dict[str, Any],
+    request_id: str | None = None,
+) -> WebhookEvent:
+    """Stores a raw notification and wakes up the workers."""
+    now = _utcnow()
+    event = WebhookEvent(
+        kind=kind,
+        resource_id=resource_id,
+        query_params=query_params,
+        body=body,
+        request_id=request_id,
+        status="pending",
+        attempts=0,
+        defer_count=0,
+        next_attempt_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(event)
+    await db.commit()
+    notify_webhook_workers()
+    return event
+
+
+def notify_webhook_workers() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _claim_next_event() -> WebhookEvent | None:
+    """
+    Claims one due event with a conditional UPDATE, so concurrent workers
+    (in this process or others) never process the same row twice.
+    """
+    async with AsyncSessionLocal() as db:
+        now = _utcnow()
+        candidate_ids = (await db.scalars(
+            select(WebhookEvent.id)
+            .where(_claimable(now))
+            .order_by(WebhookEvent.next_attempt_at, WebhookEvent.id)
+            .limit(max(settings.webhook_workers, 1))
+        )).all()
+
+        for event_id in candidate_ids:
+            res = await db.execute(
+                update(WebhookEvent)
+                .where(WebhookEvent.id == event_id, _claimable(now))
+                .values(
+                    status="processing",
+                    attempts=WebhookEvent.attempts + 1,
+                    locked_until=now + timedelta(seconds=settings.webhook_lease_s),
+                    updated_at=now,
+                )
+            )
+            if res.rowcount == 1:
+                await db.commit()
+                return await db.get(WebhookEvent, event_id)
+
+        await db.commit()
+        return None
+
+
+async def _finish_event(event_id: int, **values: Any) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id == event_id)
+            .values(locked_until=None, updated_at=_utcnow(), **values)
+        )
+        await db.commit()
+
+
+def _outcome(result: dict[str, Any]) -> str:
+    if result.get("activated"):
+        return "activated"
+    if result.get("idempotent"):
+        return "idempotent"
+    if "ignored" in result:
+        return "ignored"
+    if "warning" in result:
+        return "warning"
+    return "processed"
+
+
+async def _run_event(event: WebhookEvent, handler: WebhookHandler) -> None:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await handler(event.kind, event.resource_id, db)
+        outcome = _outcome(result)
+    except DeferProcessing as defer:
+        outcome = "deferred"
+        if event.defer_count < len(defer.delays_s):
+            await _finish_event(
+                event.id,
+                status="pending",
+                # a deferral is not a failed attempt
+                attempts=WebhookEvent.attempts - 1,
+                defer_count=WebhookEvent.defer_count + 1,
+                next_attempt_at=_utcnow() + timedelta(seconds=defer.delays_s[event.defer_count]),
+            )
+        else:
+            await _finish_event(event.id, status="done", result=defer.result, processed_at=_utcnow())
+        return
+    except Exception as exc:
+        error = repr(getattr(exc, "detail", None) or exc)
+        if event.attempts >= settings.webhook_max_attempts:
+            logger.error("Webhook event failed permanently", extra={
+                "webhook_event_id": event.id,
+                "kind": event.kind,
+                "mp_resource_id": event.resource_id,
+                "attempts": event.attempts,
+                "error": error,
+            })
+            await _finish_event(event.id, status="failed", last_error=error)
+        else:
+            await _finish_event(
+                event.id,
+                status="pending",
+                last_error=error,
+                next_attempt_at=_utcnow() + _retry_delay(event.attempts),
+            )
+        return
+
+    finally:
+        WEBHOOK_PROCESSING_DURATION.observe(time.perf_counter() - start, event.kind, outcome)
+
+    await _finish_event(event.id, status="done", result=result, last_error=None, processed_at=_utcnow())
+
+
+async def _worker_loop(handler: WebhookHandler) -> None:
+    assert _wakeup is not None
+    while True:
+        try:
+            event = await _claim_next_event()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Webhook worker could not claim events")
+            event = None
+
+        if event is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.webhook_poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        try:
+            await _run_event(event, handler)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # bookkeeping failed; the lease expires and the event is retried
+            logger.exception("Webhook worker error", extra={"webhook_event_id": event.id})
+
+
+def start_webhook_workers(handler: WebhookHandler) -> None:
+    """Starts `settings.webhook_workers` workers draining the inbox. Called from the app lifespan."""
+    global _wakeup
+    if _tasks:
+        return
+    _wakeup = asyncio.Event()
+    for i in range(settings.webhook_workers):
+        _tasks.append(asyncio.create_task(_worker_loop(handler), name=f"webhook-worker-{i}"))
+
+
+async def stop_webhook_workers() -> None:
+    global _wakeup
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    _wakeup = None
@@ -5,4 +5,14 @@ def as_utc_aware(dt: datetime | None) -> datetime | None:
         return None
     if dt.tzinfo is None:
         return dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc)
\ No newline at end of file
+    return dt.astimezone(timezone.utc)
+def parse_iso_datetime(value: str | None) -> datetime | None:
+    """Parses MP timestamps ("...Z" or with offset); None when missing/invalid."""
+    if not value:
+        return None
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+    except Exception:
+        return None
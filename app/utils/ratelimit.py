@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket: at most `rate_per_s` acquisitions per second on average,
+    with bursts of up to `burst`. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate_per_s: float, burst: int | None = None) -> None:
+        self.rate_per_s = rate_per_s
+        self.burst = burst or max(1, int(rate_per_s))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate_per_s <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_s)
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller starts
+    the call, callers arriving while it is in flight await the same result
+    (or exception). Nothing is kept once the call finishes.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # shield: a cancelled caller must not cancel the call shared with others
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable) -> None:
+        """Callers arriving after this start a new call (the running one still completes)."""
+        self._inflight.pop(key, None)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return {"inflight": len(self._inflight), "calls": self.calls, "shared": self.shared}
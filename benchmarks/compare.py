@@ -0,0 +1,64 @@
+"""
+Compares two benchmark result files.
+
+    python -m benchmarks.compare OLD.json NEW.json [--threshold 5]
+
+Prints throughput / p50 / p99 per endpoint and ns/op per helper with the
+relative change; changes beyond the threshold (%) are marked.
+"""
+import argparse
+import json
+from pathlib import Path
+
+# metric -> True when higher is better
+ENDPOINT_METRICS = {"throughput_rps": True, "p50_ms": False, "p99_ms": False}
+
+
+def _change(old: float, new: float) -> float | None:
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def _mark(change: float | None, higher_is_better: bool, threshold: float) -> str:
+    if change is None or abs(change) < threshold:
+        return ""
+    better = change > 0 if higher_is_better else change < 0
+    return "  better" if better else "  WORSE"
+
+
+def _row(name: str, old: float, new: float, higher_is_better: bool, threshold: float) -> str:
+    change = _change(old, new)
+    pct = f"{change:+7.1f}%" if change is not None else "      -"
+    return f"  {name:<16} {old:>12.2f} -> {new:>12.2f}  {pct}{_mark(change, higher_is_better, threshold)}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=5.0)
+    args = parser.parse_args()
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    print(f"{old['meta'].get('git_revision')} -> {new['meta'].get('git_revision')}")
+
+    for name, new_r in new.get("endpoints", {}).items():
+        old_r = old.get("endpoints", {}).get(name)
+        if old_r is None:
+            continue
+        print(name)
+        for metric, higher_is_better in ENDPOINT_METRICS.items():
+            print(_row(metric, old_r[metric], new_r[metric], higher_is_better, args.threshold))
+
+    for name, new_r in new.get("micro", {}).items():
+        old_r = old.get("micro", {}).get(name)
+        if old_r is None:
+            continue
+        print(name)
+        print(_row("ns_per_op", old_r["ns_per_op"], new_r["ns_per_op"], False, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
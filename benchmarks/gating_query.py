@@ -0,0 +1,234 @@
+"""
+Premium gating query on a large entitlements table: the original ORM join
+and the previous column query vs the current prebuilt query with the time
+check in SQL, before and after the (user_id, status, expires_at, plan_id)
+covering index.
+
+    python -m benchmarks.gating_query                       # 2M entitlements, throwaway SQLite
+    python -m benchmarks.gating_query --rows 5000000 --lookups 20000
+    python -m benchmarks.gating_query --database-url postgresql://...   # empty database!
+
+Prints per-lookup latency and the query plans, writes JSON to
+benchmarks/results/gating-<timestamp>.json (or --output).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+
+OLD_INDEX = ("ix_entitlements_user_status", ("user_id", "status"))
+NEW_INDEX = "ix_entitlements_user_status_expires_plan"
+
+
+def _populate(engine, n_rows: int, seed: int) -> int:
+    """Two entitlements per user over the seeded plans; returns the user count."""
+    from sqlalchemy import insert, select
+
+    from app.models import Entitlement, Plan, User
+
+    rng = random.Random(seed)
+    n_users = max(1, n_rows // 2)
+    now = datetime.now(timezone.utc)
+    chunk = 50_000
+    with engine.begin() as conn:
+        plan_ids = list(conn.execute(select(Plan.id)).scalars())
+        for start in range(0, n_users, chunk):
+            conn.execute(insert(User), [
+                {"email": f"user{i}@mpbench.io", "password_hash": "x"}
+                for i in range(start, min(start + chunk, n_users))
+            ])
+        user_ids = list(conn.execute(select(User.id).order_by(User.id)).scalars())
+
+        rows = []
+        for user_id in user_ids:
+            for plan_id in rng.sample(plan_ids, 2):
+                r = rng.random()
+                if r < 0.45:
+                    status, expires_at = "active", now + timedelta(days=rng.randint(1, 365))
+                elif r < 0.55:
+                    status, expires_at = "active", None
+                elif r < 0.65:
+                    status, expires_at = "canceled", now + timedelta(days=rng.randint(-30, 30))
+                else:
+                    status, expires_at = "inactive", now - timedelta(days=rng.randint(1, 365))
+                rows.append({"user_id": user_id, "plan_id": plan_id, "status": status,
+                             "expires_at": expires_at, "created_at": now, "updated_at": now})
+            if len(rows) >= chunk:
+                conn.execute(insert(Entitlement), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(Entitlement), rows)
+    return len(user_ids)
+
+
+def _queries(now: datetime) -> dict[str, Callable]:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app.api.deps_billing import _has_lapsed_entitlement, _load_gating_entitlements
+    from app.models import Entitlement, Plan
+
+    def legacy_orm_join(db: Session, user_id: int):
+        # the original dependency: full ORM object through a join on plans
+        return (db.query(Entitlement).join(Plan, Plan.id == Entitlement.plan_id)
+                .filter(Entitlement.user_id == user_id, Entitlement.status.in_(("active", "canceled")))
+                .first())
+
+    def columns_time_in_python(db: Session, user_id: int):
+        # the previous cache-miss query: all active/canceled rows, expiry checked in Python
+        return db.execute(
+            select(Entitlement.id, Entitlement.plan_id, Entitlement.status, Entitlement.expires_at)
+            .where(Entitlement.user_id == user_id, Entitlement.status.in_(("active", "canceled")))
+        ).all()
+
+    def gating_load(db: Session, user_id: int):
+        return _load_gating_entitlements(db, user_id, now)
+
+    def gating_lapsed_exists(db: Session, user_id: int):
+        return _has_lapsed_entitlement(db, user_id, None, now)
+
+    return {
+        "legacy_orm_join": legacy_orm_join,
+        "columns_time_in_python": columns_time_in_python,
+        "gating_load (current)": gating_load,
+        "gating_lapsed_exists (402)": gating_lapsed_exists,
+    }
+
+
+def _explain(engine, fn: Callable, user_id: int) -> list[str]:
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    captured: list[tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session(engine) as db:
+            fn(db, user_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection.cursor()
+        raw.execute(prefix + statement, parameters)
+        rows = raw.fetchall()
+    return [" | ".join(str(c) for c in row) for row in rows]
+
+
+def _measure(engine, fn: Callable, user_ids: list[int]) -> dict[str, float]:
+    from sqlalchemy.orm import Session
+
+    latencies = []
+    with Session(engine) as db:
+        for user_id in user_ids:
+            start = time.perf_counter()
+            fn(db, user_id)
+            latencies.append(time.perf_counter() - start)
+            db.expunge_all()
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "lookups": n,
+        "mean_us": round(sum(latencies) / n * 1e6, 1),
+        "p50_us": round(latencies[n // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(n - 1, int(n * 0.99))] * 1e6, 1),
+    }
+
+
+def _run_phase(name: str, engine, user_ids: list[int], now: datetime, explain: bool) -> dict[str, Any]:
+    print(f"\n== {name}")
+    results: dict[str, Any] = {}
+    for qname, fn in _queries(now).items():
+        _measure(engine, fn, user_ids[: min(500, len(user_ids))])  # warm-up
+        r = _measure(engine, fn, user_ids)
+        if explain:
+            r["plan"] = _explain(engine, fn, user_ids[0])
+        results[qname] = r
+        print(f"{qname:<28} mean {r['mean_us']:>9.1f} us  p50 {r['p50_us']:>9.1f} us  p99 {r['p99_us']:>9.1f} us")
+        for line in r.get("plan", []):
+            print(f"    {line}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000, help="entitlement rows")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--database-url", default="", help="default: throwaway SQLite file")
+    parser.add_argument("--no-explain", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='mpbench-')}/gating.db"
+    os.environ["ASYNC_DATABASE_URL"] = ""
+
+    from sqlalchemy import Index, text
+
+    from app.db.base import Base
+    from app.db.session import engine
+    from app.models import Entitlement
+    from scripts import seed_plans
+
+    Base.metadata.create_all(engine)
+    seed_plans.main()
+
+    # start from the pre-change schema: only (user_id, status)
+    new_index = next(i for i in Entitlement.__table__.indexes if i.name == NEW_INDEX)
+    new_index.drop(engine)
+    old_index = Index(OLD_INDEX[0], *(Entitlement.__table__.c[c] for c in OLD_INDEX[1]))
+    old_index.create(engine)
+
+    print(f"Populating {args.rows} entitlements ...")
+    started = time.perf_counter()
+    n_users = _populate(engine, args.rows, args.seed)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    user_ids = [rng.randint(1, n_users) for _ in range(args.lookups)]
+    now = datetime.now(timezone.utc)
+    explain = not args.no_explain
+
+    results: dict[str, Any] = {"before": _run_phase(f"index {OLD_INDEX[0]}", engine, user_ids, now, explain)}
+
+    new_index.create(engine)
+    old_index.drop(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    results["after"] = _run_phase(f"index {NEW_INDEX}", engine, user_ids, now, explain)
+
+    results["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "dialect": engine.dialect.name,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "database_url")},
+    }
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"gating-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
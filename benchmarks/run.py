@@ -0,0 +1,402 @@
+"""
+Benchmarks for the hot endpoints and helpers (not tests).
+
+The app runs in-process (httpx ASGI transport, real lifespan) against a
+throwaway SQLite database seeded with scripts/seed_plans.py plus a synthetic
+user/entitlement population. Mercado Pago is replaced by an in-memory mock.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --users 50000 --requests 5000 --concurrency 50
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+Results (throughput, p50/p90/p99 per endpoint, ns/op per helper) are written
+as JSON to benchmarks/results/ (or --output).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+PASSWORD = "bench-password"
+
+WEBHOOK_TOPICS = ("payment", "merchant_order", "preapproval", "authorized_payment")
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    # Must run before anything under app/ is imported (settings are read at import)
+    db_dir = tempfile.mkdtemp(prefix="mpbench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+    os.environ["ASYNC_DATABASE_URL"] = ""
+    os.environ["MP_ACCESS_TOKEN"] = "TEST-bench"
+    os.environ["MP_WEBHOOK_SECRET"] = ""
+    os.environ["LOG_LEVEL"] = "warning"
+    # The endpoint benchmark measures accepting notifications, not draining them
+    os.environ["WEBHOOK_WORKERS"] = "0"
+    os.environ["PROFILING_ENABLED"] = "false"
+    os.environ["PROFILING_TOKEN"] = ""
+
+
+# ---------------------------
+# data
+# ---------------------------
+
+def _prepare_database(n_users: int) -> dict[str, list[tuple[int, str]]]:
+    """
+    Creates the schema, seeds plans and n_users users with one entitlement each:
+    60% active one-time, 20% active recurring, 10% expired, 10% canceled.
+    Returns the (user_id, email) pairs per group.
+    """
+    from sqlalchemy import insert, select
+
+    from app.core.security import hash_password
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+    from app.models import Entitlement, Plan, User
+    from scripts import seed_plans
+
+    Base.metadata.create_all(engine)
+    seed_plans.main()
+
+    password_hash = hash_password(PASSWORD)
+    now = datetime.now(timezone.utc)
+    groups: dict[str, list[tuple[int, str]]] = {"active": [], "expired": [], "canceled": []}
+
+    with SessionLocal() as db:
+        plans = {p.code: p.id for p in db.execute(select(Plan)).scalars()}
+        db.execute(insert(User), [
+            {"email": f"user{i}@mpbench.io", "password_hash": password_hash}
+            for i in range(n_users)
+        ])
+        users = db.execute(select(User.id, User.email).order_by(User.id)).all()
+
+        rows = []
+        for i, (user_id, email) in enumerate(users):
+            bucket = i % 10
+            if bucket < 6:
+                row = {"plan_id": plans["one_time_30d"], "status": "active", "expires_at": now + timedelta(days=30)}
+                groups["active"].append((user_id, email))
+            elif bucket < 8:
+                row = {"plan_id": plans["recurring_monthly"], "status": "active", "expires_at": None,
+                       "mp_preapproval_id": f"pre{user_id}"}
+                groups["active"].append((user_id, email))
+            elif bucket < 9:
+                row = {"plan_id": plans["one_time_30d"], "status": "active", "expires_at": now - timedelta(days=1)}
+                groups["expired"].append((user_id, email))
+            else:
+                row = {"plan_id": plans["recurring_monthly"], "status": "canceled", "expires_at": None}
+                groups["canceled"].append((user_id, email))
+            rows.append({"user_id": user_id, "created_at": now, "updated_at": now, **row})
+        db.execute(insert(Entitlement), rows)
+        db.commit()
+    return groups
+
+
+# ---------------------------
+# mock Mercado Pago
+# ---------------------------
+
+def _mp_handler(latency_s: float) -> Callable:
+    """
+    Resources are derived from the id, whose digits are the entitlement id:
+    payment p42, merchant order mo42, preapproval pre42, authorized payment ap42.
+    """
+    import httpx
+
+    preference_ids = itertools.count(1)
+    next_payment = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+
+    def resource(path: str) -> dict[str, Any] | None:
+        rid = path.rstrip("/").rsplit("/", 1)[-1]
+        ent = "".join(c for c in rid if c.isdigit())
+        ref = f"user:0|ent:{ent}|plan:bench"
+        if "/payments/" in path:
+            return {"id": rid, "status": "approved", "status_detail": "accredited", "external_reference": ref}
+        if "/merchant_orders/" in path:
+            return {"id": rid, "payments": [{"id": f"p{ent}", "status": "approved"}]}
+        if "/authorized_payments/" in path:
+            return {"id": rid, "preapproval_id": f"pre{ent}", "external_reference": ref,
+                    "payment": {"id": f"p{ent}", "status": "approved"}}
+        if "/preapproval/" in path:
+            return {"id": rid, "status": "authorized", "external_reference": ref, "next_payment_date": next_payment}
+        return None
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency_s:
+            await asyncio.sleep(latency_s)
+        if request.method == "POST" and request.url.path == "/checkout/preferences":
+            return httpx.Response(201, json={"id": f"pref-{next(preference_ids)}", "init_point": "https://mp/x"})
+        data = resource(request.url.path)
+        if data is None:
+            return httpx.Response(404, json={"message": "not found"})
+        return httpx.Response(200, json=data)
+
+    return handler
+
+
+def _install_mock_mp(latency_s: float) -> None:
+    import httpx
+
+    from app.core.config import settings
+    from app.integrations import mp_http
+
+    # start_mp_client() keeps an existing client, so the lifespan reuses this one
+    mp_http._client = httpx.AsyncClient(
+        base_url=settings.mp_api_base,
+        headers={"Authorization": f"Bearer {settings.mp_access_token}"},
+        transport=mp_http._InstrumentedTransport(httpx.MockTransport(_mp_handler(latency_s))),
+    )
+
+
+# ---------------------------
+# measurement
+# ---------------------------
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _summary(latencies: list[float], elapsed: float, errors: int) -> dict[str, Any]:
+    values = sorted(latencies)
+    n = len(values)
+    return {
+        "requests": n,
+        "errors": errors,
+        "throughput_rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / n * 1000, 3) if n else 0.0,
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+        "p90_ms": round(_percentile(values, 0.90) * 1000, 3),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if n else 0.0,
+    }
+
+
+async def _load(call: Callable[[int], Awaitable[bool]], n: int, concurrency: int) -> dict[str, Any]:
+    """Runs n calls over `concurrency` workers. call(i) returns False on an unexpected result."""
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(n))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await call(i)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, time.perf_counter() - start, errors)
+
+
+async def _bench_endpoints(args: argparse.Namespace, groups: dict[str, list[tuple[int, str]]]) -> dict[str, Any]:
+    import httpx
+
+    from app.core.security import create_access_token
+    from app.db.session import AsyncSessionLocal
+    from app.main import app
+    from app.api.mp_webhook import process_webhook_event
+    from app.services.webhook_inbox import DeferProcessing
+
+    rng = random.Random(args.seed)
+    active = rng.sample(groups["active"], min(args.distinct_users, len(groups["active"])))
+    tokens = [
+        f"Bearer {create_access_token(str(uid), claims={'email': email})}"
+        for uid, email in active
+    ]
+    # one entitlement per user, inserted in user order -> same ids
+    ent_ids = [uid for uid, _ in active]
+    results: dict[str, Any] = {}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def premium(i: int) -> bool:
+                r = await client.get("/premium/premium-feature", headers={"Authorization": tokens[i % len(tokens)]})
+                return r.status_code == 200
+
+            async def billing_me(i: int) -> bool:
+                r = await client.get("/billing/me", headers={"Authorization": tokens[i % len(tokens)]})
+                return r.status_code == 200
+
+            async def plans(i: int) -> bool:
+                r = await client.get("/billing/plans")
+                return r.status_code == 200
+
+            async def login(i: int) -> bool:
+                _, email = active[i % len(active)]
+                r = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+                return r.status_code == 200
+
+            def webhook(topic: str) -> Callable[[int], Awaitable[bool]]:
+                async def call(i: int) -> bool:
+                    ent = ent_ids[i % len(ent_ids)]
+                    if topic == "merchant_order":
+                        params, body = {"topic": "merchant_order", "id": f"mo{ent}"}, {}
+                    elif topic == "payment":
+                        params, body = {"type": "payment", "data.id": f"p{ent}"}, {"type": "payment", "data": {"id": f"p{ent}"}}
+                    elif topic == "preapproval":
+                        params, body = {}, {"type": "preapproval", "data": {"id": f"pre{ent}"}}
+                    else:
+                        params, body = {}, {"type": "subscription_authorized_payment", "data": {"id": f"ap{ent}"}}
+                    # unique request id per call, otherwise the dedupe ledger absorbs them
+                    headers = {"x-request-id": f"bench-{topic}-{i}-{time.monotonic_ns()}"}
+                    r = await client.post("/mp/webhook", params=params, json=body, headers=headers)
+                    return r.status_code == 200
+                return call
+
+            def process(kind: str) -> Callable[[int], Awaitable[bool]]:
+                prefix = {"payment": "p", "merchant_order": "mo", "preapproval": "pre", "authorized_payment": "ap"}[kind]
+
+                async def call(i: int) -> bool:
+                    ent = ent_ids[i % len(ent_ids)]
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            result = await process_webhook_event(kind, f"{prefix}{ent}", db)
+                    except DeferProcessing:
+                        return True
+                    return bool(result.get("ok"))
+                return call
+
+            scenarios: list[tuple[str, Callable[[int], Awaitable[bool]], int]] = [
+                ("GET /premium/premium-feature", premium, args.requests),
+                ("GET /billing/me", billing_me, args.requests),
+                ("GET /billing/plans", plans, args.requests),
+                ("POST /auth/login", login, args.login_requests),
+            ]
+            scenarios += [(f"POST /mp/webhook [{t}]", webhook(t), args.requests) for t in WEBHOOK_TOPICS]
+            scenarios += [(f"process_webhook_event [{t}]", process(t), args.requests) for t in WEBHOOK_TOPICS]
+
+            for name, call, n in scenarios:
+                if args.only and args.only not in name:
+                    continue
+                # warm-up: caches, pools, first-import costs
+                await _load(call, min(args.warmup, n), args.concurrency)
+                results[name] = await _load(call, n, args.concurrency)
+                _print_row(name, results[name])
+    return results
+
+
+def _bench_micro() -> dict[str, Any]:
+    from app.api.billing import _add_interval
+    from app.api.mp_webhook import _parse_entitlement_id_from_external_reference
+    from app.integrations.mp_webhooks import verify_mp_signature
+
+    import hashlib
+    import hmac
+
+    secret = "bench-secret"
+    manifest = "id:123456789;request-id:bench-req;ts:1700000000;"
+    v1 = hmac.new(secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    start = datetime(2026, 1, 31, tzinfo=timezone.utc)
+
+    cases: dict[str, Callable[[], Any]] = {
+        "_parse_entitlement_id_from_external_reference[hit]":
+            lambda: _parse_entitlement_id_from_external_reference("user:12|ent:3456|order:abc123|plan:recurring_monthly"),
+        "_parse_entitlement_id_from_external_reference[miss]":
+            lambda: _parse_entitlement_id_from_external_reference("order:abc123|plan:recurring_monthly"),
+        "verify_mp_signature[valid]":
+            lambda: verify_mp_signature(secret=secret, x_signature=f"ts=1700000000,v1={v1}",
+                                        x_request_id="bench-req", data_id="123456789"),
+        "verify_mp_signature[invalid]":
+            lambda: verify_mp_signature(secret=secret, x_signature="ts=1700000000,v1=deadbeef",
+                                        x_request_id="bench-req", data_id="123456789"),
+        "_add_interval[months]": lambda: _add_interval(start, 1, "months"),
+        "_add_interval[years]": lambda: _add_interval(start, 1, "years"),
+        "_add_interval[days]": lambda: _add_interval(start, 30, "days"),
+    }
+
+    results: dict[str, Any] = {}
+    for name, fn in cases.items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number
+        results[name] = {"ns_per_op": round(best * 1e9, 1), "loops": number}
+        print(f"{name:<60} {results[name]['ns_per_op']:>12.1f} ns/op")
+    return results
+
+
+def _print_row(name: str, r: dict[str, Any]) -> None:
+    print(
+        f"{name:<45} {r['throughput_rps']:>9.1f} req/s  "
+        f"p50 {r['p50_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}"
+    )
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def _main(args: argparse.Namespace) -> dict[str, Any]:
+    from app.db.session import async_engine
+
+    print(f"Seeding {args.users} users ...")
+    groups = _prepare_database(args.users)
+    _install_mock_mp(args.mp_latency_ms / 1000)
+    try:
+        endpoints = {} if args.skip_endpoints else await _bench_endpoints(args, groups)
+    finally:
+        await async_engine.dispose()
+    micro = {} if args.skip_micro else _bench_micro()
+    return {"endpoints": endpoints, "micro": micro}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="synthetic users (one entitlement each)")
+    parser.add_argument("--distinct-users", type=int, default=1000, help="users the requests cycle through")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="login requests (bcrypt bound)")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mp-latency-ms", type=float, default=0.0, help="simulated MP API latency")
+    parser.add_argument("--only", default="", help="run only scenarios whose name contains this")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="", help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    _configure_env(args)
+    results = asyncio.run(_main(args))
+
+    results["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+    }
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results" / f"{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
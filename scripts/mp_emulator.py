@@ -0,0 +1,420 @@
+"""
+Local stand-in for the Mercado Pago API endpoints this app uses, for load
+tests that shouldn't touch the real sandbox.
+
+    python -m scripts.mp_emulator --port 8081 --webhook-url http://127.0.0.1:8000/mp/webhook \\
+        --latency lognormal:80,0.4 --error-rate 0.01 --rate-429 0.02 --mo-payments-delay 3
+
+and run the app with:
+
+    MP_API_BASE=http://127.0.0.1:8081 MP_WEBHOOK_SECRET=emulator-secret MP_ACCESS_TOKEN=TEST-emulator
+
+Implemented: POST /checkout/preferences, POST/GET/PUT /preapproval,
+GET /v1/payments/{id}, /merchant_orders/{id}, /authorized_payments/{id}.
+State is kept in memory. A created preference is "paid" after --auto-pay-after
+seconds (payment + merchant order, whose payments[] only shows up after
+--mo-payments-delay), a created preapproval is authorized and charged after
+--auto-authorize-after; each step sends a signed webhook to --webhook-url.
+/_emulator/* routes trigger the same steps by hand and expose the state.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+
+logger = logging.getLogger("mp_emulator")
+
+
+@dataclass
+class LatencyDistribution:
+    """
+    Parsed from "fixed:MS", "uniform:MIN_MS,MAX_MS", "exp:MEAN_MS"
+    or "lognormal:MEDIAN_MS,SIGMA" (long right tail, closest to the real API).
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v] or [0.0]
+        if kind not in ("fixed", "uniform", "exp", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind, values[0], values[1] if len(values) > 1 else 0.0)
+
+    def sample_s(self) -> float:
+        if self.kind == "uniform":
+            ms = random.uniform(self.a, self.b)
+        elif self.kind == "exp":
+            ms = random.expovariate(1 / self.a) if self.a else 0.0
+        elif self.kind == "lognormal":
+            ms = random.lognormvariate(math.log(self.a), self.b) if self.a else 0.0
+        else:
+            ms = self.a
+        return max(ms, 0.0) / 1000
+
+
+@dataclass
+class EmulatorConfig:
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    # a negative delay disables the automatic step
+    auto_pay_after_s: float = 1.0
+    auto_authorize_after_s: float = 1.0
+    mo_payments_delay_s: float = 3.0
+    payment_status: str = "approved"
+    webhook_url: str = ""
+    webhook_secret: str = "emulator-secret"
+    webhook_delay_s: float = 0.0
+    # MP re-sends notifications; this fraction is delivered twice
+    webhook_duplicate_rate: float = 0.0
+
+
+class EmulatorState:
+    def __init__(self):
+        self.preferences: dict[str, dict[str, Any]] = {}
+        self.preapprovals: dict[str, dict[str, Any]] = {}
+        self.payments: dict[str, dict[str, Any]] = {}
+        self.merchant_orders: dict[str, dict[str, Any]] = {}
+        self.authorized_payments: dict[str, dict[str, Any]] = {}
+        self.requests = 0
+        self.faults = {"429": 0, "500": 0}
+        self.webhooks = {"sent": 0, "failed": 0}
+        self._ids = itertools.count(int(time.time()) * 1000)
+
+    def next_id(self) -> str:
+        return str(next(self._ids))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "preferences": len(self.preferences),
+            "preapprovals": len(self.preapprovals),
+            "payments": len(self.payments),
+            "merchant_orders": len(self.merchant_orders),
+            "authorized_payments": len(self.authorized_payments),
+            "requests": self.requests,
+            "faults": self.faults,
+            "webhooks": self.webhooks,
+        }
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(404, {"message": "resource not found", "error": "not_found", "status": 404})
+
+
+def create_emulator(config: EmulatorConfig) -> FastAPI:
+    state = EmulatorState()
+    tasks: set[asyncio.Task] = set()
+    client: httpx.AsyncClient | None = None
+
+    def later(delay_s: float, coro) -> None:
+        async def run():
+            await asyncio.sleep(delay_s)
+            await coro
+
+        task = asyncio.create_task(run())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    # ---------------------------
+    # webhooks
+    # ---------------------------
+
+    async def deliver(params: dict[str, str], body: dict[str, Any], data_id: str) -> None:
+        request_id = str(uuid.uuid4())
+        ts = str(int(time.time()))
+        manifest = f"id:{data_id};request-id:{request_id};ts:{ts};"
+        v1 = hmac.new(config.webhook_secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+        headers = {"x-signature": f"ts={ts},v1={v1}", "x-request-id": request_id}
+        try:
+            r = await client.post(config.webhook_url, params=params, json=body, headers=headers)
+            state.webhooks["sent"] += 1
+            if r.status_code >= 400:
+                logger.warning("Webhook rejected: %s %s", r.status_code, r.text[:200])
+        except httpx.HTTPError as exc:
+            state.webhooks["failed"] += 1
+            logger.warning("Webhook delivery failed: %r", exc)
+
+    def notify(params: dict[str, str], body: dict[str, Any], data_id: str) -> None:
+        if not config.webhook_url:
+            return
+        later(config.webhook_delay_s, deliver(params, body, data_id))
+        if random.random() < config.webhook_duplicate_rate:
+            later(config.webhook_delay_s + random.uniform(0.1, 2.0), deliver(params, body, data_id))
+
+    def notify_payment(payment_id: str) -> None:
+        body = {"type": "payment", "action": "payment.created", "data": {"id": payment_id}}
+        notify({"type": "payment", "data.id": payment_id}, body, payment_id)
+
+    def notify_merchant_order(mo_id: str) -> None:
+        body = {"resource": f"https://api.mercadolibre.com/merchant_orders/{mo_id}", "topic": "merchant_order"}
+        notify({"topic": "merchant_order", "id": mo_id}, body, mo_id)
+
+    def notify_preapproval(pre_id: str) -> None:
+        body = {"type": "subscription_preapproval", "action": "updated", "data": {"id": pre_id}}
+        notify({"type": "subscription_preapproval", "data.id": pre_id}, body, pre_id)
+
+    def notify_authorized_payment(ap_id: str) -> None:
+        body = {"type": "subscription_authorized_payment", "action": "created", "data": {"id": ap_id}}
+        notify({"type": "subscription_authorized_payment", "data.id": ap_id}, body, ap_id)
+
+    # ---------------------------
+    # simulated buyer actions
+    # ---------------------------
+
+    async def pay_preference(pref_id: str, status: str) -> dict[str, Any]:
+        pref = state.preferences[pref_id]
+        mo_id, payment_id = state.next_id(), state.next_id()
+        amount = sum(float(i.get("unit_price", 0)) * int(i.get("quantity", 1)) for i in pref.get("items", []))
+        payment = {
+            "id": payment_id,
+            "status": status,
+            "status_detail": "accredited" if status == "approved" else f"cc_{status}",
+            "external_reference": pref.get("external_reference"),
+            "metadata": pref.get("metadata") or {},
+            "transaction_amount": amount,
+            "payment_method_id": "visa",
+            "payment_type_id": "credit_card",
+            "order": {"id": mo_id, "type": "mercadopago"},
+            "date_created": _now().isoformat(),
+        }
+        state.payments[payment_id] = payment
+        # MP notifies the merchant order before its payments[] is populated
+        state.merchant_orders[mo_id] = {
+            "id": mo_id,
+            "preference_id": pref_id,
+            "external_reference": pref.get("external_reference"),
+            "status": "opened",
+            "payments": [],
+        }
+
+        async def attach_payment():
+            mo = state.merchant_orders[mo_id]
+            mo["payments"].append({"id": payment_id, "status": status})
+            mo["status"] = "closed" if status == "approved" else "opened"
+            notify_merchant_order(mo_id)
+
+        notify_merchant_order(mo_id)
+        notify_payment(payment_id)
+        later(config.mo_payments_delay_s, attach_payment())
+        return payment
+
+    async def authorize_preapproval(pre_id: str) -> dict[str, Any]:
+        pre = state.preapprovals[pre_id]
+        pre["status"] = "authorized"
+        auto = pre.get("auto_recurring") or {}
+        unit_days = {"days": 1, "months": 30, "years": 365}.get(auto.get("frequency_type"), 30)
+        days = unit_days * int(auto.get("frequency") or 1)
+        pre["next_payment_date"] = (_now() + timedelta(days=days)).isoformat()
+        pre["last_modified"] = _now().isoformat()
+        notify_preapproval(pre_id)
+        await charge_preapproval(pre_id, config.payment_status)
+        return pre
+
+    async def charge_preapproval(pre_id: str, status: str) -> dict[str, Any]:
+        pre = state.preapprovals[pre_id]
+        ap_id, payment_id = state.next_id(), state.next_id()
+        auth = {
+            "id": ap_id,
+            "preapproval_id": pre_id,
+            "external_reference": pre.get("external_reference"),
+            "status": "processed",
+            "transaction_amount": (pre.get("auto_recurring") or {}).get("transaction_amount"),
+            "payment": {"id": payment_id, "status": status, "status_detail": "accredited" if status == "approved" else status},
+            "date_created": _now().isoformat(),
+        }
+        state.authorized_payments[ap_id] = auth
+        notify_authorized_payment(ap_id)
+        return auth
+
+    # ---------------------------
+    # MP API
+    # ---------------------------
+
+    async def simulate(request: Request) -> None:
+        state.requests += 1
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            raise HTTPException(401, {"message": "unauthorized", "status": 401})
+        await asyncio.sleep(config.latency.sample_s())
+        r = random.random()
+        if r < config.rate_429:
+            state.faults["429"] += 1
+            raise HTTPException(429, {"message": "too many requests", "status": 429}, headers={"Retry-After": "1"})
+        if r < config.rate_429 + config.error_rate:
+            state.faults["500"] += 1
+            raise HTTPException(500, {"message": "internal_error", "status": 500})
+
+    api = APIRouter(dependencies=[Depends(simulate)])
+
+    @api.post("/checkout/preferences", status_code=201)
+    async def create_preference(payload: dict[str, Any]):
+        pref_id = f"{random.randint(100000000, 999999999)}-{uuid.uuid4()}"
+        pref = {
+            **payload,
+            "id": pref_id,
+            "init_point": f"https://www.mercadopago.com/checkout/v1/redirect?pref_id={pref_id}",
+            "sandbox_init_point": f"https://sandbox.mercadopago.com/checkout/v1/redirect?pref_id={pref_id}",
+            "date_created": _now().isoformat(),
+        }
+        state.preferences[pref_id] = pref
+        if config.auto_pay_after_s >= 0:
+            later(config.auto_pay_after_s, pay_preference(pref_id, config.payment_status))
+        return pref
+
+    @api.post("/preapproval", status_code=201)
+    async def create_preapproval(payload: dict[str, Any]):
+        pre_id = uuid.uuid4().hex
+        pre = {
+            **payload,
+            "id": pre_id,
+            "status": "pending",
+            "init_point": f"https://www.mercadopago.com/subscriptions/checkout?preapproval_id={pre_id}",
+            "date_created": _now().isoformat(),
+        }
+        state.preapprovals[pre_id] = pre
+        if config.auto_authorize_after_s >= 0:
+            later(config.auto_authorize_after_s, authorize_preapproval(pre_id))
+        return pre
+
+    @api.get("/preapproval/{pre_id}")
+    async def get_preapproval(pre_id: str):
+        if pre_id not in state.preapprovals:
+            raise _not_found()
+        return state.preapprovals[pre_id]
+
+    @api.put("/preapproval/{pre_id}")
+    async def update_preapproval(pre_id: str, payload: dict[str, Any]):
+        pre = state.preapprovals.get(pre_id)
+        if pre is None:
+            raise _not_found()
+        changed = payload.get("status") not in (None, pre.get("status"))
+        pre.update(payload)
+        pre["last_modified"] = _now().isoformat()
+        if changed:
+            notify_preapproval(pre_id)
+        return pre
+
+    @api.get("/v1/payments/{payment_id}")
+    async def get_payment(payment_id: str):
+        if payment_id not in state.payments:
+            raise _not_found()
+        return state.payments[payment_id]
+
+    @api.get("/merchant_orders/{mo_id}")
+    async def get_merchant_order(mo_id: str):
+        if mo_id not in state.merchant_orders:
+            raise _not_found()
+        return state.merchant_orders[mo_id]
+
+    @api.get("/authorized_payments/{ap_id}")
+    async def get_authorized_payment(ap_id: str):
+        if ap_id not in state.authorized_payments:
+            raise _not_found()
+        return state.authorized_payments[ap_id]
+
+    # ---------------------------
+    # control
+    # ---------------------------
+
+    control = APIRouter(prefix="/_emulator")
+
+    @control.get("/state")
+    async def get_state():
+        return state.snapshot()
+
+    @control.post("/reset")
+    async def reset():
+        state.__init__()
+        return state.snapshot()
+
+    @control.post("/preferences/{pref_id}/pay")
+    async def manual_pay(pref_id: str, status: str = "approved"):
+        if pref_id not in state.preferences:
+            raise _not_found()
+        return await pay_preference(pref_id, status)
+
+    @control.post("/preapproval/{pre_id}/authorize")
+    async def manual_authorize(pre_id: str):
+        if pre_id not in state.preapprovals:
+            raise _not_found()
+        return await authorize_preapproval(pre_id)
+
+    @control.post("/preapproval/{pre_id}/charge")
+    async def manual_charge(pre_id: str, status: str = "approved"):
+        if pre_id not in state.preapprovals:
+            raise _not_found()
+        return await charge_preapproval(pre_id, status)
+
+    async def lifespan(app: FastAPI):
+        nonlocal client
+        client = httpx.AsyncClient(timeout=10.0)
+        try:
+            yield
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await client.aclose()
+
+    app = FastAPI(title="Mercado Pago emulator", lifespan=lifespan)
+    app.include_router(api)
+    app.include_router(control)
+    app.state.emulator = state
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="lognormal:80,0.4", help="fixed:MS | uniform:MIN,MAX | exp:MEAN | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API calls answered with 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of API calls answered with 429")
+    parser.add_argument("--auto-pay-after", type=float, default=1.0, help="seconds; negative = never")
+    parser.add_argument("--auto-authorize-after", type=float, default=1.0, help="seconds; negative = never")
+    parser.add_argument("--mo-payments-delay", type=float, default=3.0, help="seconds before merchant_order.payments is populated")
+    parser.add_argument("--payment-status", default="approved")
+    parser.add_argument("--webhook-url", default="http://127.0.0.1:8000/mp/webhook", help="empty = don't send webhooks")
+    parser.add_argument("--webhook-secret", default="emulator-secret")
+    parser.add_argument("--webhook-delay", type=float, default=0.0)
+    parser.add_argument("--webhook-duplicate-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    config = EmulatorConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        auto_pay_after_s=args.auto_pay_after,
+        auto_authorize_after_s=args.auto_authorize_after,
+        mo_payments_delay_s=args.mo_payments_delay,
+        payment_status=args.payment_status,
+        webhook_url=args.webhook_url,
+        webhook_secret=args.webhook_secret,
+        webhook_delay_s=args.webhook_delay,
+        webhook_duplicate_rate=args.webhook_duplicate_rate,
+    )
+    uvicorn.run(create_emulator(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
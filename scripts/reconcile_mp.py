@@ -0,0 +1,52 @@
+"""
+Re-syncs entitlements with their current Mercado Pago state (missed webhooks).
+
+    python -m scripts.reconcile_mp [--concurrency 16] [--rate 50] [--page-size 500] [--dry-run] [--restart]
+
+Interrupted runs resume from the checkpoint file (RECONCILE_CHECKPOINT_PATH).
+"""
+import argparse
+import asyncio
+from dataclasses import asdict
+
+from app.core.logging import setup_logging, shutdown_logging
+from app.db.session import async_engine
+from app.integrations.mp_http import close_mp_client, start_mp_client
+from app.services.reconciliation import reconcile_entitlements
+
+
+async def run(args: argparse.Namespace) -> None:
+    await start_mp_client()
+    try:
+        stats = await reconcile_entitlements(
+            page_size=args.page_size,
+            concurrency=args.concurrency,
+            rate_per_s=args.rate,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+            dry_run=args.dry_run,
+        )
+        print("Reconciliation finished:", asdict(stats))
+    finally:
+        await close_mp_client()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None, help="MP calls in flight")
+    parser.add_argument("--rate", type=float, default=None, help="MP calls per second (0 = unlimited)")
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first entitlement")
+    parser.add_argument("--dry-run", action="store_true", help="fetch and compare, don't commit")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutdown_logging()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.plan import Plan
+from app.services.plan_catalog import bump_plan_catalog_version
 
 PLANS = [
     # One-Time Memberships
@@ -40,6 +41,8 @@ def main():
     try:
         for data in PLANS:
             upsert_plan(db, data)
+        # running apps reload their in-memory plan catalog
+        bump_plan_catalog_version(db)
         db.commit()
         print("Seeded plans:", [p["code"] for p in PLANS])
     finally:
@@ -0,0 +1,66 @@
+import asyncio
+import itertools
+import os
+import tempfile
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+# Throwaway SQLite database; must be set before app settings are imported
+_tmp = tempfile.mkdtemp(prefix="mpapp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ["MP_WEBHOOK_SECRET"] = ""
+os.environ["MP_ACCESS_TOKEN"] = "TEST-tests"
+os.environ["EXPIRY_SWEEP_INTERVAL_S"] = "0"
+# no inbox workers and no real MP: tests drive processing themselves
+os.environ["WEBHOOK_WORKERS"] = "0"
+os.environ["MP_API_BASE"] = "http://127.0.0.1:9"
+
+_user_seq = itertools.count(1)
+
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.models import Entitlement, User  # noqa: E402
+from app.services.plan_catalog import bump_plan_catalog_version, get_plan_catalog  # noqa: E402
+from scripts.seed_plans import PLANS, upsert_plan  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        for plan in PLANS:
+            upsert_plan(db, plan)
+        bump_plan_catalog_version(db)
+        db.commit()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def run() -> Callable[[Awaitable[Any]], Any]:
+    """Runs a coroutine on a fresh loop; async pool connections don't outlive it."""
+    def _run(coro: Awaitable[Any]) -> Any:
+        async def _wrapped():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(_wrapped())
+    return _run
+
+
+@pytest.fixture
+def make_entitlement():
+    """Creates a user with one entitlement on the given plan code; returns the entitlement id."""
+    def _make(plan_code: str, **values: Any) -> int:
+        with SessionLocal() as db:
+            user = User(email=f"user{next(_user_seq)}@tests.io", password_hash="x")
+            db.add(user)
+            db.flush()
+            ent = Entitlement(user_id=user.id, plan_id=get_plan_catalog().by_code[plan_code].id, **values)
+            db.add(ent)
+            db.commit()
+            return ent.id
+    return _make
@@ -0,0 +1,23 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT
+from app.db.session import engine
+
+
+def _checkouts(label: str) -> int:
+    counts, _ = DB_POOL_CHECKOUT_WAIT._values.get((label,), ([], None))
+    return sum(counts)
+
+
+def test_sync_pool_records_checkout_wait():
+    assert isinstance(engine.pool, QueuePool)
+    before = _checkouts("sync")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert _checkouts("sync") == before + 1
+
+    engine.dispose()  # the recreated pool keeps the instrumented class
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert _checkouts("sync") == before + 2
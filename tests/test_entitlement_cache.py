@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import deps_billing
+from app.api.deps import Principal
+from app.api.mp_webhook import _process_payment
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.models import Entitlement
+from app.services.entitlement_cache import (
+    EntitlementCache,
+    entitlement_cache,
+    invalidate_user_entitlements,
+    to_cached_entitlement,
+)
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_set_after_invalidation_is_dropped():
+    cache = EntitlementCache(10, ttl_s=300, negative_ttl_s=5)
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.set(1, (to_cached_entitlement(7, "one_time_30d", "active", None),), NOW, generation)
+    assert cache.get(1, NOW) is None
+    assert cache.stats()["stale_writes"] == 1
+
+    cache.set(1, (), NOW, cache.generation)
+    assert cache.get(1, NOW) == ()
+
+
+def test_denials_expire_sooner():
+    cache = EntitlementCache(10, ttl_s=300, negative_ttl_s=5)
+    cache.set(1, (), NOW)
+    cache.set(2, (to_cached_entitlement(7, "one_time_30d", "active", None),), NOW)
+    later = NOW + timedelta(seconds=6)
+    assert cache.get(1, later) is None
+    assert cache.get(2, later) is not None
+
+
+def test_webhook_commit_during_gating_load_is_not_cached(make_entitlement, monkeypatch):
+    ent_id = make_entitlement("one_time_30d", status="inactive")
+    with SessionLocal() as db:
+        user_id = db.get(Entitlement, ent_id).user_id
+    load = deps_billing._load_gating_entitlements
+
+    def load_then_webhook_commits(db, uid, now):
+        ents = load(db, uid, now)  # sees the unpaid entitlement
+        with SessionLocal() as other:
+            other.get(Entitlement, ent_id).status = "active"
+            other.commit()
+        invalidate_user_entitlements(uid)
+        return ents
+
+    monkeypatch.setattr(deps_billing, "_load_gating_entitlements", load_then_webhook_commits)
+    gate = deps_billing.require_active_entitlement()
+    principal = Principal(id=user_id, email="x@tests.io")
+
+    with SessionLocal() as db, pytest.raises(HTTPException) as denied:
+        gate(db, principal)
+    assert denied.value.status_code == 402
+    assert entitlement_cache.get(user_id, datetime.now(timezone.utc)) is None
+
+    monkeypatch.setattr(deps_billing, "_load_gating_entitlements", load)
+    with SessionLocal() as db:
+        assert gate(db, principal).id == ent_id
+
+
+def test_webhook_commit_invalidates_a_cached_denial(run, make_entitlement):
+    ent_id = make_entitlement("one_time_30d", status="inactive")
+    with SessionLocal() as db:
+        principal = Principal(id=db.get(Entitlement, ent_id).user_id, email="x@tests.io")
+    gate = deps_billing.require_active_entitlement()
+
+    with SessionLocal() as db, pytest.raises(HTTPException):
+        gate(db, principal)
+    assert entitlement_cache.get(principal.id, datetime.now(timezone.utc)) == ()
+
+    async def approve():
+        async with AsyncSessionLocal() as db:
+            await _process_payment("pay-cache-1", {"status": "approved", "metadata": {"entitlement_id": ent_id}}, db)
+
+    run(approve())
+    with SessionLocal() as db:
+        assert gate(db, principal).id == ent_id
+
+
+def test_entry_never_outlives_the_earliest_expiry():
+    cache = EntitlementCache(10, ttl_s=300, negative_ttl_s=5)
+    expires_at = NOW + timedelta(seconds=30)
+    cache.set(1, (to_cached_entitlement(7, "one_time_30d", "active", expires_at),), NOW)
+    assert cache.get(1, NOW + timedelta(seconds=29)) is not None
+    assert cache.get(1, expires_at) is None
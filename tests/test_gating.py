@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.deps import Principal
+from app.api.deps_billing import require_active_entitlement
+from app.db.session import SessionLocal
+from app.models import Entitlement
+
+
+@pytest.mark.parametrize(("status", "detail"), [
+    ("inactive", "Active entitlement required"),
+    ("past_due", "Active entitlement required"),
+    ("active", "Entitlement has expired"),
+    ("canceled", "Entitlement has expired"),
+])
+def test_denial_message_for_lapsed_rows(make_entitlement, status, detail):
+    ent_id = make_entitlement(
+        "one_time_30d", status=status, expires_at=datetime.now(timezone.utc) - timedelta(days=1),
+    )
+    with SessionLocal() as db:
+        principal = Principal(id=db.get(Entitlement, ent_id).user_id, email="x@tests.io")
+        with pytest.raises(HTTPException) as denied:
+            require_active_entitlement()(db, principal)
+    assert denied.value.detail == detail
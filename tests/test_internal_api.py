@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.main import create_app
+from app.models import Entitlement
+
+AUTH = {"Authorization": "Bearer svc-token"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "internal_api_tokens", ["svc-token"])
+    with TestClient(create_app()) as client:
+        yield client
+
+
+@pytest.fixture
+def users(make_entitlement):
+    """(paying user, lapsed user) ids."""
+    future = datetime.now(timezone.utc) + timedelta(days=10)
+    past = datetime.now(timezone.utc) - timedelta(days=1)
+    ent_ids = [
+        make_entitlement("recurring_monthly", status="active", expires_at=future),
+        make_entitlement("one_time_30d", status="active", expires_at=past),
+    ]
+    with SessionLocal() as db:
+        return [db.get(Entitlement, ent_id).user_id for ent_id in ent_ids]
+
+
+def test_requires_service_token(client):
+    body = {"user_ids": [1]}
+    assert client.post("/internal/entitlements/check", json=body).status_code == 401
+    assert client.post("/internal/entitlements/check/stream", json=body,
+                       headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_batch_check(client, users):
+    paying, lapsed = users
+    r = client.post("/internal/entitlements/check", headers=AUTH,
+                    json={"user_ids": [paying, lapsed, paying, 999999]})
+    assert r.status_code == 200
+    assert r.json()["users"] == {str(paying): ["recurring_monthly"], str(lapsed): [], "999999": []}
+
+
+def test_batch_check_filters_plans(client, users):
+    paying, _ = users
+    check = lambda codes: client.post("/internal/entitlements/check", headers=AUTH,
+                                      json={"user_ids": [paying], "plan_codes": codes}).json()["users"]
+    assert check(["recurring_monthly"]) == {str(paying): ["recurring_monthly"]}
+    assert check(["recurring_annual"]) == {str(paying): []}
+    assert check(["no_such_plan"]) == {str(paying): []}
+
+
+def test_batch_size_limits(client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_check_max_users", 2)
+    assert client.post("/internal/entitlements/check", headers=AUTH, json={"user_ids": []}).status_code == 422
+    r = client.post("/internal/entitlements/check", headers=AUTH, json={"user_ids": [1, 2, 3]})
+    assert r.status_code == 422
+    # duplicates don't count against the limit
+    assert client.post("/internal/entitlements/check", headers=AUTH, json={"user_ids": [1, 2, 2]}).status_code == 200
+
+
+def test_stream_check(client, users, monkeypatch):
+    monkeypatch.setattr("app.api.internal._STREAM_CHUNK", 2)
+    paying, lapsed = users
+    user_ids = [paying, lapsed, 999998, 999999, 999997]
+    r = client.post("/internal/entitlements/check/stream", headers=AUTH, json={"user_ids": user_ids})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [line["user_id"] for line in lines] == user_ids
+    assert lines[0]["plans"] == ["recurring_monthly"]
+    assert all(line["plans"] == [] for line in lines[1:])
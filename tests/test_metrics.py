@@ -0,0 +1,15 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import create_app
+
+
+def test_metrics_requires_service_token(monkeypatch):
+    monkeypatch.setattr(settings, "internal_api_tokens", ["scraper-token"])
+    with TestClient(create_app()) as client:
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+        r = client.get("/metrics", headers={"Authorization": "Bearer scraper-token"})
+        assert r.status_code == 200
+        assert "http_request_duration_seconds" in r.text
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timezone
+
+from app.api import mp_webhook
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.integrations.mp_cache import (
+    TTLCache,
+    cache_mp_resource,
+    get_cached_mp_resource,
+    invalidate_mp_resource,
+    mp_cache_generation,
+)
+from app.models import Entitlement
+from app.utils.singleflight import SingleFlight
+
+
+def test_write_from_fetch_started_before_invalidation_is_dropped():
+    cache = TTLCache(10)
+    started = cache.generation
+    cache.invalidate("k")
+    cache.set("k", "old", 60, started)
+    assert cache.get("k") is None
+    assert cache.stats()["stale_writes"] == 1
+
+    cache.set("k", "new", 60, cache.generation)
+    assert cache.get("k") == "new"
+
+
+def test_evicted_invalidation_records_still_drop_old_writes():
+    cache = TTLCache(2)
+    started = cache.generation
+    for key in ("a", "b", "c"):
+        cache.invalidate(key)
+    cache.set("a", "old", 60, started)
+    assert cache.get("a") is None
+
+
+def test_inflight_fetch_across_invalidation_does_not_repopulate(run):
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def slow_fetch():
+        await release.wait()
+        return {"id": "pre-x", "next_payment_date": "old"}
+
+    async def scenario():
+        generation = mp_cache_generation()
+        reader = asyncio.create_task(flight.do(("preapproval", "pre-x"), slow_fetch))
+        await asyncio.sleep(0)
+        invalidate_mp_resource("preapproval", "pre-x")
+        release.set()
+        cache_mp_resource("preapproval", "pre-x", await reader, generation)
+        return get_cached_mp_resource("preapproval", "pre-x")
+
+    assert run(scenario()) is None
+
+
+def test_authorized_payment_refetches_preapproval(run, make_entitlement, monkeypatch):
+    ent_id = make_entitlement("recurring_monthly", status="active", mp_preapproval_id="pre-ap-1")
+    cache_mp_resource("preapproval", "pre-ap-1", {"id": "pre-ap-1", "next_payment_date": "2030-01-01T00:00:00Z"})
+
+    async def fresh(path, key):
+        return {"id": "pre-ap-1", "next_payment_date": "2030-02-01T00:00:00Z"}
+
+    monkeypatch.setattr(mp_webhook, "mp_get_json", fresh)
+    auth = {"preapproval_id": "pre-ap-1", "payment": {"id": 9001, "status": "approved"}}
+
+    async def deliver():
+        async with AsyncSessionLocal() as db:
+            return await mp_webhook._process_authorized_payment("ap-1", auth, db)
+
+    assert run(deliver())["ent_status"] == "active"
+    with SessionLocal() as db:
+        expires_at = db.get(Entitlement, ent_id).expires_at
+    assert expires_at.replace(tzinfo=timezone.utc) == datetime(2030, 2, 1, tzinfo=timezone.utc)
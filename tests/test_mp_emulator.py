@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from scripts.mp_emulator import EmulatorConfig, LatencyDistribution, create_emulator
+
+AUTH = {"Authorization": "Bearer TEST-emulator"}
+
+
+def _client(**config) -> TestClient:
+    return TestClient(create_emulator(EmulatorConfig(**config)))
+
+
+def test_latency_specs():
+    assert LatencyDistribution.parse("fixed:20").sample_s() == pytest.approx(0.02)
+    assert 0.01 <= LatencyDistribution.parse("uniform:10,30").sample_s() <= 0.03
+    assert LatencyDistribution.parse("lognormal:80,0.5").kind == "lognormal"
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("gamma:1")
+
+
+def test_fault_injection():
+    with _client(error_rate=1.0) as client:
+        assert client.get("/v1/payments/1", headers=AUTH).status_code == 500
+        assert client.get("/v1/payments/1").status_code == 401
+    with _client(rate_429=1.0) as client:
+        r = client.get("/v1/payments/1", headers=AUTH)
+        assert r.status_code == 429
+        assert r.headers["retry-after"] == "1"
+        assert client.get("/_emulator/state").json()["faults"] == {"429": 1, "500": 0}
+
+
+def test_checkout_payment_shows_up_on_the_merchant_order_later():
+    with _client(auto_pay_after_s=-1, mo_payments_delay_s=60) as client:
+        pref = client.post("/checkout/preferences", headers=AUTH, json={
+            "items": [{"unit_price": 10, "quantity": 2}],
+            "external_reference": "user:1|ent:2",
+            "metadata": {"entitlement_id": 2},
+        }).json()
+        payment = client.post(f"/_emulator/preferences/{pref['id']}/pay").json()
+
+        fetched = client.get(f"/v1/payments/{payment['id']}", headers=AUTH).json()
+        assert fetched["status"] == "approved"
+        assert fetched["metadata"] == {"entitlement_id": 2}
+        assert fetched["transaction_amount"] == 20
+
+        mo = client.get(f"/merchant_orders/{payment['order']['id']}", headers=AUTH).json()
+        assert mo["preference_id"] == pref["id"]
+        assert mo["payments"] == []
+
+
+def test_authorizing_a_preapproval_charges_it():
+    with _client(auto_authorize_after_s=-1) as client:
+        pre = client.post("/preapproval", headers=AUTH, json={
+            "auto_recurring": {"frequency": 1, "frequency_type": "months", "transaction_amount": 99},
+        }).json()
+        assert client.get(f"/preapproval/{pre['id']}", headers=AUTH).json()["status"] == "pending"
+
+        authorized = client.post(f"/_emulator/preapproval/{pre['id']}/authorize").json()
+        assert authorized["status"] == "authorized"
+        assert authorized["next_payment_date"]
+        assert client.get("/_emulator/state").json()["authorized_payments"] == 1
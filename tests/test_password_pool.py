@@ -0,0 +1,26 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core import security
+
+
+@pytest.fixture
+def pool():
+    security.start_password_pool()
+    yield
+    security.shutdown_password_pool()
+
+
+def test_broken_pool_is_recreated(pool):
+    async def scenario():
+        first = security._pool
+        # the worker dies on both attempts: reported as busy (503), not a 500
+        with pytest.raises(security.PasswordHasherBusy):
+            await security._run_in_pool(os._exit, 1)
+        assert security._pool is not first
+        hashed = await security.hash_password_async("secret")
+        return await security.verify_password_async("secret", hashed)
+
+    assert asyncio.run(scenario()) is True
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from app.api.mp_webhook import _process_payment
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.models import Entitlement
+from app.services.expiry_sweeper import sweep_expired_entitlements
+
+
+def _payment(ent_id: int, status: str = "approved") -> dict:
+    return {"status": status, "metadata": {"entitlement_id": ent_id}}
+
+
+async def _deliver(payment_id: str, payment: dict) -> dict:
+    async with AsyncSessionLocal() as db:
+        return await _process_payment(payment_id, payment, db)
+
+
+def _load(ent_id: int) -> Entitlement:
+    with SessionLocal() as db:
+        return db.get(Entitlement, ent_id)
+
+
+def _expire(ent_id: int) -> None:
+    with SessionLocal() as db:
+        db.get(Entitlement, ent_id).expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.commit()
+
+
+def test_redelivered_approval_after_sweep_does_not_reopen_access(run, make_entitlement):
+    ent_id = make_entitlement("one_time_30d")
+    assert run(_deliver("pay-1", _payment(ent_id)))["activated"] is True
+
+    _expire(ent_id)
+    assert run(sweep_expired_entitlements()) >= 1
+    swept = _load(ent_id)
+    assert swept.status == "inactive"
+
+    assert run(_deliver("pay-1", _payment(ent_id))) == {"ok": True, "idempotent": True}
+    ent = _load(ent_id)
+    assert ent.status == "inactive"
+    assert ent.expires_at == swept.expires_at
+
+
+def test_pending_then_approved_payment_activates(run, make_entitlement):
+    ent_id = make_entitlement("one_time_30d")
+    assert run(_deliver("pay-2", _payment(ent_id, "pending")))["activated"] is False
+    assert run(_deliver("pay-2", _payment(ent_id)))["activated"] is True
+    assert _load(ent_id).status == "active"
+
+
+def test_new_payment_after_expiry_activates(run, make_entitlement):
+    ent_id = make_entitlement("one_time_30d")
+    run(_deliver("pay-3", _payment(ent_id)))
+    _expire(ent_id)
+    run(sweep_expired_entitlements())
+
+    assert run(_deliver("pay-4", _payment(ent_id)))["activated"] is True
+    ent = _load(ent_id)
+    assert ent.status == "active"
+    assert ent.expires_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
@@ -0,0 +1,29 @@
+from app.db.session import SessionLocal, async_engine
+from app.models import Entitlement
+from app.services import reconciliation
+
+
+def test_no_connection_held_during_fetch_and_webhook_updates_win(run, make_entitlement, monkeypatch, tmp_path):
+    raced = make_entitlement("recurring_monthly", status="active", mp_preapproval_id="pre-rc-1")
+    quiet = make_entitlement("recurring_monthly", status="active", mp_preapproval_id="pre-rc-2")
+    checked_out = []
+
+    async def fetch(kind, resource_id, path, limiter):
+        checked_out.append(async_engine.pool.checkedout())
+        if resource_id == "pre-rc-1":
+            # a webhook lands while MP is being asked
+            with SessionLocal() as db:
+                db.get(Entitlement, raced).status = "inactive"
+                db.commit()
+        return {"id": resource_id, "status": "cancelled"}
+
+    monkeypatch.setattr(reconciliation, "_fetch_mp", fetch)
+    stats = run(reconciliation.reconcile_entitlements(
+        page_size=100, rate_per_s=0, checkpoint_path=str(tmp_path / "cp.json"), restart=True,
+    ))
+
+    assert checked_out and set(checked_out) == {0}
+    assert stats.concurrent == 1
+    with SessionLocal() as db:
+        assert db.get(Entitlement, raced).status == "inactive"
+        assert db.get(Entitlement, quiet).status == "canceled"
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"id": 1}
+
+        callers = [asyncio.create_task(flight.do("k", fetch)) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+        # finished: the next caller starts a new call
+        await flight.do("k", fetch)
+        return calls, results, flight.stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert calls == 2
+    assert all(r is results[0] for r in results)
+    assert stats == {"inflight": 0, "calls": 2, "shared": 9}
+
+
+def test_errors_reach_every_waiter_and_a_cancelled_caller_does_not_cancel_the_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("MP 502")
+
+        leader = asyncio.create_task(flight.do("k", fetch))
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+        with pytest.raises(RuntimeError, match="MP 502"):
+            await follower
+        return leader.cancelled()
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_forget_starts_a_fresh_call_for_later_callers():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        versions = iter(("old", "new"))
+
+        async def fetch():
+            value = next(versions)
+            if value == "old":
+                await release.wait()
+            return value
+
+        before = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        flight.forget("k")  # the resource changed
+        after = await flight.do("k", fetch)
+        release.set()
+        return await before, after
+
+    assert asyncio.run(scenario()) == ("old", "new")
@@ -0,0 +1,23 @@
+import importlib
+from datetime import datetime, timedelta, timezone
+
+from app.db.session import SessionLocal
+from app.models.revoked_token import RevokedToken
+from app.services import token_denylist
+
+
+def test_first_check_loads_the_denylist_on_a_fresh_host(monkeypatch):
+    with SessionLocal() as db:
+        db.add(RevokedToken(
+            jti="revoked-elsewhere",
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+            revoked_at=datetime.now(timezone.utc),
+        ))
+        db.commit()
+    # a process that has never loaded it (module defaults), on a host with
+    # less monotonic uptime than the refresh interval
+    importlib.reload(token_denylist)
+    monkeypatch.setattr(token_denylist.time, "monotonic", lambda: 1.0)
+
+    with SessionLocal() as db:
+        assert token_denylist.is_token_revoked(db, "revoked-elsewhere")
@@ -0,0 +1,41 @@
+from sqlalchemy import event
+
+from app.api.deps import get_current_user, invalidate_user
+from app.db.session import SessionLocal, engine
+from app.models import User
+
+
+def _create_user(email: str) -> int:
+    with SessionLocal() as db:
+        user = User(email=email, password_hash="x")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_current_user_is_cached_until_invalidated():
+    user_id = _create_user("cached@tests.io")
+    payload = {"sub": str(user_id)}
+    queries = []
+
+    def count(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        with SessionLocal() as db:
+            first = get_current_user(payload, db)
+        with SessionLocal() as db:
+            second = get_current_user(payload, db)
+        assert second is first
+        assert second.email == "cached@tests.io"
+        assert len(queries) == 1
+
+        with SessionLocal() as db:
+            db.merge(first).email = "renamed@tests.io"
+            db.commit()
+        invalidate_user(user_id)
+        with SessionLocal() as db:
+            assert get_current_user(payload, db).email == "renamed@tests.io"
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+
+from app.api import mp_webhook
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.main import create_app
+from app.models.webhook_dedupe import WebhookDedupe
+from app.models.webhook_event import WebhookEvent
+from app.services.webhook_dedupe import is_duplicate_notification
+from app.services.webhook_inbox import enqueue_webhook_event
+
+
+def _count(model, resource_id: str) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(model).where(model.resource_id == resource_id))
+
+
+def test_retry_after_failed_enqueue_is_not_a_duplicate(monkeypatch):
+    enqueue = mp_webhook.enqueue_webhook_event
+    calls = []
+
+    async def failing_once(db, **kwargs):
+        calls.append(kwargs["resource_id"])
+        if len(calls) == 1:
+            raise RuntimeError("inbox unavailable")
+        return await enqueue(db, **kwargs)
+
+    monkeypatch.setattr(mp_webhook, "enqueue_webhook_event", failing_once)
+    notification = {"type": "payment", "action": "payment.created", "data": {"id": "7001"}}
+    headers = {"x-request-id": "req-7001"}
+
+    with TestClient(create_app(), raise_server_exceptions=False) as client:
+        first = client.post("/mp/webhook", json=notification, headers=headers)
+        assert first.status_code == 500
+        assert _count(WebhookDedupe, "7001") == 0
+
+        retry = client.post("/mp/webhook", json=notification, headers=headers)
+        assert retry.status_code == 200
+        assert retry.json()["queued"] is True
+
+        again = client.post("/mp/webhook", json=notification, headers=headers)
+        assert again.json() == {"ok": True, "duplicate": True}
+
+    assert _count(WebhookEvent, "7001") == 1
+    assert _count(WebhookDedupe, "7001") == 1
+
+
+async def _notify(resource_id: str, request_id: str | None, body: dict) -> bool:
+    async with AsyncSessionLocal() as db:
+        if await is_duplicate_notification(db, kind="payment", resource_id=resource_id, request_id=request_id, body=body):
+            return True
+        await enqueue_webhook_event(
+            db, kind="payment", resource_id=resource_id, query_params={}, body=body, request_id=request_id,
+        )
+        return False
+
+
+def test_redelivery_is_absorbed_by_the_ledger(run):
+    body = {"type": "payment", "data": {"id": "7101"}}
+    assert run(_notify("7101", "req-7101", body)) is False
+    with SessionLocal() as db:
+        db.execute(update(WebhookEvent).where(WebhookEvent.resource_id == "7101").values(status="done"))
+        db.commit()
+
+    assert run(_notify("7101", "req-7101", body)) is True
+    assert _count(WebhookEvent, "7101") == 1
+
+
+def test_new_notification_coalesces_into_the_pending_event(run):
+    assert run(_notify("7201", "req-a", {"action": "payment.created"})) is False
+    assert run(_notify("7201", "req-b", {"action": "payment.updated"})) is True
+    assert _count(WebhookEvent, "7201") == 1
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.models.webhook_event import WebhookEvent
+from app.services import webhook_inbox
+from app.services.webhook_inbox import (
+    _claim_next_event,
+    _run_event,
+    enqueue_webhook_event,
+    start_webhook_workers,
+    stop_webhook_workers,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_inbox():
+    with SessionLocal() as db:
+        db.execute(delete(WebhookEvent))
+        db.commit()
+
+
+async def _enqueue(n: int, kind: str = "payment") -> list[int]:
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for i in range(n):
+            event = await enqueue_webhook_event(db, kind=kind, resource_id=f"inbox-{i}", query_params={}, body={})
+            ids.append(event.id)
+    return ids
+
+
+def _load(event_id: int) -> WebhookEvent:
+    with SessionLocal() as db:
+        return db.get(WebhookEvent, event_id)
+
+
+def test_concurrent_claims_never_share_an_event(run):
+    async def scenario():
+        ids = await _enqueue(5)
+        claimed = []
+        # a claimer that loses every race on its candidates gets None and polls again
+        for _ in range(10):
+            batch = await asyncio.gather(*(_claim_next_event() for _ in range(8)))
+            claimed += [e.id for e in batch if e is not None]
+        return ids, claimed
+
+    ids, claimed = run(scenario())
+    assert sorted(claimed) == sorted(ids)  # each exactly once
+    assert all(_load(i).status == "processing" for i in ids)
+
+
+def test_expired_lease_is_reclaimed(run):
+    async def scenario():
+        [event_id] = await _enqueue(1)
+        first = await _claim_next_event()
+        while_leased = await _claim_next_event()
+        async with AsyncSessionLocal() as db:
+            event = await db.get(WebhookEvent, event_id)
+            event.locked_until = webhook_inbox._utcnow() - timedelta(seconds=1)  # the worker died
+            await db.commit()
+        return first, while_leased, await _claim_next_event()
+
+    first, while_leased, reclaimed = run(scenario())
+    assert while_leased is None
+    assert reclaimed.id == first.id
+    assert reclaimed.attempts == 2
+
+
+def test_failures_back_off_then_fail_permanently(run, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_max_attempts", 2)
+
+    async def failing(kind, resource_id, db):
+        raise RuntimeError("MP down")
+
+    async def attempt():
+        event = await _claim_next_event()
+        await _run_event(event, failing)
+        return event.id
+
+    async def make_due(event_id):
+        async with AsyncSessionLocal() as db:
+            event = await db.get(WebhookEvent, event_id)
+            event.next_attempt_at = webhook_inbox._utcnow()
+            await db.commit()
+
+    run(_enqueue(1))
+    event_id = run(attempt())
+    retried = _load(event_id)
+    assert retried.status == "pending"
+    assert "MP down" in retried.last_error
+    assert run(_claim_next_event()) is None  # backing off
+
+    run(make_due(event_id))
+    run(attempt())
+    assert _load(event_id).status == "failed"
+
+
+def test_workers_drain_the_inbox(run, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_workers", 3)
+    seen = []
+
+    async def handler(kind, resource_id, db):
+        seen.append(resource_id)
+        return {"ok": True}
+
+    async def scenario():
+        start_webhook_workers(handler)
+        try:
+            ids = await _enqueue(6)
+            for _ in range(100):
+                if len(seen) >= len(ids):
+                    break
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.1)  # let the last bookkeeping commit
+            return ids
+        finally:
+            await stop_webhook_workers()
+
+    ids = run(scenario())
+    assert sorted(seen) == sorted(f"inbox-{i}" for i in range(6))
+    assert all(_load(i).status == "done" for i in ids)